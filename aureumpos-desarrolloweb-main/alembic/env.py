@@ -10,7 +10,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.database import Base
 from app.config import settings
-from app.models import User, Category, Product, Cart, CartItem, Quotation, QuotationItem
+from app.models import (
+    User, Category, Product, Cart, CartItem, Quotation, QuotationItem, RefreshToken,
+    ReportDailyProduct, ReportDaily, ReportDailyCustomer, ReportState, CatalogState, CatalogDeletedProduct
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
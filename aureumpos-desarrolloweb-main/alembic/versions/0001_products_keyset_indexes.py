@@ -0,0 +1,28 @@
+"""products keyset pagination indexes
+
+Revision ID: 0001_products_keyset
+Revises: 
+Create Date: 2026-10-18 09:00:00
+
+El esquema base lo crea la aplicación al iniciar (Base.metadata.create_all),
+por eso los índices se crean con IF NOT EXISTS.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_products_keyset'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_name_id ON products (name, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_price_id ON products (price, id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_products_price_id")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_id")
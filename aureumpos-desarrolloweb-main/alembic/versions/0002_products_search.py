@@ -0,0 +1,45 @@
+"""products trigram search index
+
+Revision ID: 0002_products_search
+Revises: 0001_products_keyset
+Create Date: 2026-10-18 10:00:00
+
+Índice GIN trigram sobre el nombre del producto sin acentos ni mayúsculas.
+unaccent() no es IMMUTABLE, así que se envuelve en f_unaccent() para poder
+usarlo en un índice por expresión.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_products_search'
+down_revision = '0001_products_keyset'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        # SQLite usa la tabla FTS5 que crea la aplicación al iniciar
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_products_name_trgm "
+        "ON products USING gin (f_unaccent(lower(name)) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
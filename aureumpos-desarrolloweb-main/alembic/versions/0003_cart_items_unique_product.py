@@ -0,0 +1,51 @@
+"""cart_items unique (cart_id, product_id)
+
+Revision ID: 0003_cart_items_unique
+Revises: 0002_products_search
+Create Date: 2026-10-18 11:00:00
+
+Respalda el INSERT ... ON CONFLICT (cart_id, product_id) de add-to-cart.
+Antes de crear el índice único se unen las filas duplicadas sumando sus
+cantidades en la fila más antigua.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_cart_items_unique'
+down_revision = '0002_products_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(duplicates.quantity) FROM cart_items AS duplicates
+            WHERE duplicates.cart_id = cart_items.cart_id
+              AND duplicates.product_id = cart_items.product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart_items
+            GROUP BY cart_id, product_id
+            HAVING COUNT(*) > 1
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM cart_items WHERE id NOT IN (
+            SELECT MIN(id) FROM cart_items GROUP BY cart_id, product_id
+        )
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_items_cart_id_product_id "
+        "ON cart_items (cart_id, product_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_cart_items_cart_id_product_id")
@@ -0,0 +1,41 @@
+"""refresh_tokens table
+
+Revision ID: 0004_refresh_tokens
+Revises: 0003_cart_items_unique
+Create Date: 2026-10-18 13:00:00
+
+Guarda el hash SHA-256 de cada refresh token emitido por /auth/login y
+/auth/refresh. La búsqueda por token_hash usa el índice único; user_id se
+indexa para revocar y limpiar los tokens de un usuario.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_refresh_tokens'
+down_revision = '0003_cart_items_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # La tabla ya existe si la aplicación arrancó antes (create_all en el startup)
+    if "refresh_tokens" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_refresh_tokens_id", "refresh_tokens", ["id"])
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    op.create_index("ix_refresh_tokens_token_hash", "refresh_tokens", ["token_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("refresh_tokens")
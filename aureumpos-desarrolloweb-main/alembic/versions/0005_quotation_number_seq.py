@@ -0,0 +1,32 @@
+"""quotation_number_seq sequence
+
+Revision ID: 0005_quotation_number_seq
+Revises: 0004_refresh_tokens
+Create Date: 2026-10-18 16:00:00
+
+Secuencia de los números de cotización (COT-YYYYMMDD-00000001). El número
+se calcula en el mismo INSERT de la cotización, así dos cotizaciones creadas
+en el mismo segundo ya no chocan con el índice único de quotation_number.
+Solo PostgreSQL; en SQLite el número sale de MAX(id) + 1 (escrituras serializadas).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_quotation_number_seq'
+down_revision = '0004_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE SEQUENCE IF NOT EXISTS quotation_number_seq")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP SEQUENCE IF EXISTS quotation_number_seq")
@@ -0,0 +1,35 @@
+"""quotations history indexes
+
+Revision ID: 0006_quotations_history
+Revises: 0005_quotation_number_seq
+Create Date: 2026-10-18 17:00:00
+
+Respalda GET /quotations/page: (user_id, created_at) para la paginación por
+cursor del historial y quotation_items.quotation_id para cargar los items de
+una página en una sola consulta (selectinload) y contarlos en modo resumen.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_quotations_history'
+down_revision = '0005_quotation_number_seq'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_quotations_user_id_created_at "
+        "ON quotations (user_id, created_at)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_quotation_items_quotation_id "
+        "ON quotation_items (quotation_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_quotation_items_quotation_id")
+    op.execute("DROP INDEX IF EXISTS ix_quotations_user_id_created_at")
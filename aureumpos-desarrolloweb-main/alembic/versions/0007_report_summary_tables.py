@@ -0,0 +1,70 @@
+"""report summary tables
+
+Revision ID: 0007_report_summary_tables
+Revises: 0006_quotations_history
+Create Date: 2026-10-18 18:00:00
+
+Tablas de resumen de los reportes de administración (/reports). Se llenan
+de forma incremental desde quotations / quotation_items; tras crearlas, el
+primer refresco (al iniciar la aplicación o con POST /reports/refresh)
+agrega todo el historial.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_report_summary_tables'
+down_revision = '0006_quotations_history'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Las tablas ya existen si la aplicación arrancó antes (create_all en el startup)
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    
+    if "report_daily_products" not in existing:
+        op.create_table(
+            "report_daily_products",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("product_id", sa.Integer(), primary_key=True),
+            sa.Column("category_id", sa.Integer()),
+            sa.Column("quotation_count", sa.Integer(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("revenue", sa.Numeric(14, 2), nullable=False),
+        )
+        op.create_index("ix_report_daily_products_product_id", "report_daily_products", ["product_id"])
+        op.create_index("ix_report_daily_products_category_id", "report_daily_products", ["category_id"])
+    
+    if "report_daily" not in existing:
+        op.create_table(
+            "report_daily",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("quotation_count", sa.Integer(), nullable=False),
+            sa.Column("line_count", sa.Integer(), nullable=False),
+            sa.Column("units", sa.Integer(), nullable=False),
+            sa.Column("revenue", sa.Numeric(14, 2), nullable=False),
+        )
+    
+    if "report_daily_customers" not in existing:
+        op.create_table(
+            "report_daily_customers",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), primary_key=True),
+        )
+    
+    if "report_state" not in existing:
+        op.create_table(
+            "report_state",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("last_quotation_id", sa.Integer(), nullable=False),
+            sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("report_state")
+    op.drop_table("report_daily_customers")
+    op.drop_table("report_daily")
+    op.drop_table("report_daily_products")
@@ -0,0 +1,52 @@
+"""catalog versions for the terminal snapshot
+
+Revision ID: 0008_catalog_versions
+Revises: 0007_report_summary_tables
+Create Date: 2026-10-18 19:00:00
+
+Versión del catálogo (/catalog): tabla de estado, versión de último cambio en
+cada producto y lápidas de productos borrados para el modo delta. Los
+productos existentes quedan en la versión 0, es decir, en el snapshot inicial.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_catalog_versions'
+down_revision = '0007_report_summary_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Las tablas ya existen si la aplicación arrancó antes (create_all en el startup)
+    inspector = sa.inspect(op.get_bind())
+    existing = inspector.get_table_names()
+    
+    if "catalog_version" not in {column["name"] for column in inspector.get_columns("products")}:
+        op.add_column("products", sa.Column("catalog_version", sa.Integer(), nullable=False, server_default="0"))
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_catalog_version ON products (catalog_version)")
+    
+    if "catalog_state" not in existing:
+        op.create_table(
+            "catalog_state",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+    
+    if "catalog_deleted_products" not in existing:
+        op.create_table(
+            "catalog_deleted_products",
+            sa.Column("product_id", sa.Integer(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_catalog_deleted_products_version", "catalog_deleted_products", ["version"])
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_deleted_products")
+    op.drop_table("catalog_state")
+    op.execute("DROP INDEX IF EXISTS ix_products_catalog_version")
+    op.drop_column("products", "catalog_version")
@@ -1,17 +1,18 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_session, run_db
 from app.models.user import User
 from app.core.security import decode_access_token
+from app.core.principal import UserPrincipal, principal_cache, remember_principal
 
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
+def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Get the claims of a valid JWT token"""
     token = credentials.credentials
     payload = decode_access_token(token)
     
@@ -22,22 +23,33 @@ def get_current_user(
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+    return payload
+
+def get_token_user_id(
+    payload: dict = Depends(get_token_payload)
+) -> int:
+    """Get the user id from a valid JWT token"""
     # 2. Obtener el ID de forma segura (convirtiendo a int por si viene como string)
     try:
         user_id_raw = payload.get("sub")
         if user_id_raw is None:
             raise ValueError("Sub no encontrado")
-        user_id = int(user_id_raw)
+        return int(user_id_raw)
     except (ValueError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="ID de usuario malformado en el token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+async def get_current_user(
+    user_id: int = Depends(get_token_user_id),
+    db: Session = Depends(get_session)
+) -> User:
+    """Get current authenticated user from JWT token"""
     # 3. Buscar el usuario en la base de datos
-    user = db.query(User).filter(User.id == user_id).first()
+    read_started = time.monotonic()
+    user = await run_db(db, lambda session: session.get(User, user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,22 +57,49 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    remember_principal(user, read_started)
     return user
 
-def get_current_active_user(
+async def get_verified_principal(user_id: int, db: Session) -> UserPrincipal:
+    """Get the principal as stored in users, cached for AUTH_PRINCIPAL_CACHE_TTL seconds"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    
+    user = await get_current_user(user_id, db)
+    return UserPrincipal.from_user(user)
+
+async def get_current_principal(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_session)
+) -> UserPrincipal:
+    """Get the current authenticated principal from the token claims"""
+    # Carrito y cotizaciones solo necesitan el id: no se consulta users ni la caché
+    principal = UserPrincipal.from_claims(payload)
+    if principal is not None:
+        return principal
+    
+    # Tokens emitidos antes de que llevaran claims
+    return await get_verified_principal(get_token_user_id(payload), db)
+
+async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
     """Get current active user"""
     return current_user
 
-def get_current_admin(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+async def get_current_admin(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+) -> UserPrincipal:
     """Get current admin user"""
+    # El claim descarta sin consultas a quien nunca fue admin; el rol se confirma
+    # contra users (o la caché) para que quitar el rol no espere a que venza el token
+    if current_user.is_admin:
+        current_user = await get_verified_principal(current_user.id, db)
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No tienes permisos de administrador"
         )
     return current_user
-
@@ -1,29 +1,142 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import timedelta
-from app.database import get_db
+from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timedelta, timezone
+from app.database import get_session, run_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserLogin, Token, UserResponse
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.models.refresh_token import RefreshToken
+from app.schemas.user import UserCreate, UserLogin, Token, TokenRefresh, UserResponse
+from app.core.security import (
+    verify_password_async, get_password_hash_async, password_needs_rehash, create_access_token,
+    create_refresh_token, hash_refresh_token
+)
 from app.config import settings
+from app.core.principal import UserPrincipal
 from app.api.deps import get_current_active_user
 
 router = APIRouter(prefix="/auth", tags=["autenticación"])
 
 
+def find_user_by_email(db: Session, email: str):
+    """Buscar un usuario por email"""
+    return db.query(User).filter(User.email == email).first()
+
+
+def save_user(db: Session, user: User) -> User:
+    """Guardar un usuario nuevo o modificado"""
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def issue_tokens(db: Session, user: User) -> dict:
+    """Emitir un access token y un refresh token nuevo para el usuario
+    
+    Guarda el hash del refresh token, borra los vencidos del usuario y confirma
+    en la misma transacción cualquier cambio pendiente del usuario.
+    """
+    now = datetime.now(timezone.utc)
+    refresh_token = create_refresh_token()
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user.id,
+        RefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    db.add(RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(refresh_token),
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    
+    # Crear token de acceso
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=UserPrincipal.from_user(user).claims(), expires_delta=access_token_expires
+    )
+    
+    # La respuesta se arma antes del commit, que expira los objetos cargados
+    response = {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "user": UserResponse.model_validate(user)
+    }
+    db.commit()
+    return response
+
+
+def invalid_refresh_token() -> HTTPException:
+    """Error 401 común a los refresh tokens rechazados"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> dict:
+    """Cambiar un refresh token por uno nuevo (rotación)
+    
+    Una sola lectura por el índice único de token_hash trae el token y su usuario.
+    Si llega un token ya rotado se asume que fue robado y se revocan todos los
+    refresh tokens activos del usuario.
+    """
+    now = datetime.now(timezone.utc)
+    stored = db.query(RefreshToken).options(joinedload(RefreshToken.user)).filter(
+        RefreshToken.token_hash == hash_refresh_token(refresh_token)
+    ).first()
+    
+    if not stored:
+        raise invalid_refresh_token()
+    
+    if stored.revoked_at is not None:
+        db.query(RefreshToken).filter(
+            RefreshToken.user_id == stored.user_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+        db.commit()
+        raise invalid_refresh_token()
+    
+    # SQLite devuelve fechas sin zona horaria; se guardan en UTC
+    expires_at = stored.expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if expires_at <= now:
+        raise invalid_refresh_token()
+    
+    # Revocar de forma condicional: de dos renovaciones simultáneas solo una gana
+    revoked = db.query(RefreshToken).filter(
+        RefreshToken.id == stored.id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    if not revoked:
+        db.rollback()
+        raise invalid_refresh_token()
+    
+    return issue_tokens(db, stored.user)
+
+
+def revoke_refresh_token(db: Session, refresh_token: str) -> None:
+    """Revocar un refresh token (logout)"""
+    db.query(RefreshToken).filter(
+        RefreshToken.token_hash == hash_refresh_token(refresh_token),
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.now(timezone.utc)}, synchronize_session=False)
+    db.commit()
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_session)):
     """Registrar un nuevo usuario"""
     # Verificar si el email ya existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_db(db, find_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado"
         )
     
-    # Crear nuevo usuario
-    hashed_password = get_password_hash(user_data.password)
+    # Crear nuevo usuario (el hash se calcula en el pool de procesos de contraseñas)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -34,40 +147,43 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         is_admin=False
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
-    return new_user
+    return await run_db(db, save_user, new_user)
 
 
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: Session = Depends(get_session)):
     """Iniciar sesión y obtener token JWT"""
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = await run_db(db, find_user_by_email, credentials.email)
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Crear token de acceso
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
-    )
+    # Regenerar el hash si se hizo con otro costo de BCRYPT_ROUNDS (se guarda junto con el refresh token)
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(credentials.password)
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    return await run_db(db, issue_tokens, user)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(data: TokenRefresh, db: Session = Depends(get_session)):
+    """Renovar el access token con un refresh token, sin volver a enviar la contraseña"""
+    return await run_db(db, rotate_refresh_token, data.refresh_token)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(data: TokenRefresh, db: Session = Depends(get_session)):
+    """Revocar un refresh token"""
+    await run_db(db, revoke_refresh_token, data.refresh_token)
+    return None
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """Obtener información del usuario actual"""
     return current_user
 
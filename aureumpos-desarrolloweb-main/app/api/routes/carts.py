@@ -1,193 +1,358 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Integer, and_, cast, delete, func, literal, select, update
+from sqlalchemy.orm import Session, aliased
+from typing import Union
 from decimal import Decimal
-from app.database import get_db
+from app.database import get_session, run_db, dialect_insert
 from app.models.cart import Cart, CartItem
 from app.models.product import Product
-from app.schemas.cart import CartItemCreate, CartItemUpdate, CartResponse, CartItemResponse
-from app.api.deps import get_current_active_user
-from app.models.user import User
+from app.schemas.cart import CartItemCreate, CartItemUpdate, CartResponse, CartItemResponse, CartChangeResponse
+from app.schemas.product import ProductResponse
+from app.api.deps import get_current_principal
+from app.core.principal import UserPrincipal
+from app.core.read_models import CART_ROW_COLUMNS, PRODUCT_ROW_COLUMNS, CartRow, CartItemRow, ProductRow
+from app.core.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/carts", tags=["carritos"])
 
+# ?return=minimal devuelve solo la línea modificada y el nuevo total
+RETURN_MODE = Query("full", alias="return", pattern="^(full|minimal)$")
+
 
 def get_or_create_cart(user_id: int, db: Session) -> Cart:
     """Obtener o crear el carrito del usuario"""
-    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
+    query = db.query(Cart)
+    cart = query.filter(Cart.user_id == user_id).first()
     if not cart:
-        cart = Cart(user_id=user_id)
-        db.add(cart)
+        # ON CONFLICT DO NOTHING: dos peticiones simultáneas no chocan con carts.user_id único
+        db.execute(
+            dialect_insert(db, Cart)
+            .values(user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[Cart.user_id])
+        )
         db.commit()
-        db.refresh(cart)
+        cart = query.filter(Cart.user_id == user_id).first()
     return cart
 
 
-@router.get("", response_model=CartResponse)
-def get_cart(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Obtener el carrito del usuario actual"""
-    cart = get_or_create_cart(current_user.id, db)
-    
-    # Calcular total y preparar items
-    items_response = []
-    total = Decimal("0.00")
-    
-    for item in cart.items:
-        # Actualizar precio si el producto cambió de precio
-        if item.product.price != item.unit_price:
-            item.unit_price = item.product.price
-        
-        subtotal = item.unit_price * item.quantity
-        total += subtotal
-        
-        items_response.append(CartItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            product=item.product,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
+def cart_total_without(line):
+    """Total del carrito de `line` con los precios actuales, sin contar la propia línea
+    
+    Dejar fuera la línea escrita hace que el resultado no dependa de si la lectura
+    ve la fila antes o después del cambio.
+    """
+    other = aliased(CartItem)
+    return select(
+        func.coalesce(func.sum(Product.price * other.quantity), 0)
+    ).select_from(other).join(
+        Product, Product.id == other.product_id
+    ).where(
+        other.cart_id == line.c.cart_id,
+        other.id != line.c.id
+    ).scalar_subquery()
+
+
+def select_cart_line(line):
+    """SELECT de la respuesta reducida: la línea escrita, su producto y el total del resto"""
+    return select(
+        line.c.id, line.c.cart_id, line.c.quantity, line.c.unit_price,
+        *PRODUCT_ROW_COLUMNS, cart_total_without(line)
+    ).join_from(line, Product, Product.id == line.c.product_id)
+
+
+def select_removed_line(line):
+    """SELECT de la respuesta reducida de una línea eliminada: su carrito y el total restante"""
+    return select(line.c.cart_id, cart_total_without(line))
+
+
+LINE_COLUMNS = (CartItem.id, CartItem.cart_id, CartItem.product_id, CartItem.quantity, CartItem.unit_price)
+
+
+def write_cart_line(db: Session, stmt, read=select_cart_line, columns=LINE_COLUMNS):
+    """Ejecutar la escritura de una línea del carrito y leer la fila de la respuesta
+    
+    En PostgreSQL la escritura va en un CTE (WITH line AS (... RETURNING ...)) y
+    `read` se resuelve en la misma sentencia. SQLite no admite escrituras dentro
+    de WITH: ahí la lectura es una segunda sentencia con los valores devueltos.
+    Devuelve None si la escritura no tocó ninguna fila.
+    """
+    stmt = stmt.returning(*columns)
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(read(stmt.cte("line"))).first()
+    
+    written = db.execute(stmt).first()
+    if written is None:
+        return None
+    line = select(*(literal(value).label(name) for name, value in written._mapping.items())).subquery("line")
+    return db.execute(read(line)).first()
+
+
+def user_cart_item(user_id: int, item_id: int):
+    """Condición de un item que pertenece al carrito del usuario"""
+    return and_(CartItem.id == item_id, CartItem.cart_id.in_(select(Cart.id).where(Cart.user_id == user_id)))
+
+
+def item_not_found() -> HTTPException:
+    """Error 404 de un item que no está en el carrito del usuario"""
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Item no encontrado en el carrito"
+    )
+
+
+def cart_change_from_line(row) -> CartChangeResponse:
+    """Respuesta reducida armada con una fila de select_cart_line"""
+    item_id, cart_id, quantity, unit_price, *product_values, other_total = row
+    product = ProductRow(*product_values)
+    subtotal = unit_price * quantity
+    return CartChangeResponse(
+        cart_id=cart_id,
+        item=CartItemResponse(
+            id=item_id,
+            product_id=product.id,
+            product=ProductResponse.model_validate(product),
+            quantity=quantity,
+            unit_price=unit_price,
             subtotal=subtotal
-        ))
+        ),
+        total=other_total + subtotal
+    )
+
+
+def finish_cart_change(
+    db: Session,
+    user_id: int,
+    change: CartChangeResponse,
+    return_mode: str
+) -> Union[CartChangeResponse, FastJSONResponse]:
+    """Confirmar un cambio del carrito y responder
     
-    # Guardar cambios de precio si hubo
+    En modo minimal la respuesta es la fila que devolvió la sentencia; el carrito
+    completo se vuelve a leer solo cuando se pide.
+    """
     db.commit()
+    if return_mode == "minimal":
+        return change
+    return FastJSONResponse(read_cart(db, user_id))
+
+
+def upsert_cart_item(user_id: int, product_id: int, quantity: int, db: Session):
+    """Agregar un producto al carrito del usuario en una sola sentencia
     
-    return CartResponse(
-        id=cart.id,
-        user_id=cart.user_id,
-        items=items_response,
-        total=total,
-        created_at=cart.created_at,
-        updated_at=cart.updated_at
+    INSERT ... SELECT toma el carrito y el precio actual del producto, y
+    ON CONFLICT (cart_id, product_id) suma la cantidad si ya estaba en el carrito.
+    Devuelve la fila de select_cart_line, o None si no existe el carrito o el producto.
+    """
+    source = select(
+        Cart.id,
+        Product.id,
+        cast(literal(quantity), Integer),
+        Product.price
+    ).select_from(Cart).join(Product, Product.id == product_id).where(Cart.user_id == user_id)
+    
+    stmt = dialect_insert(db, CartItem).from_select(
+        ["cart_id", "product_id", "quantity", "unit_price"], source
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={
+            "quantity": CartItem.quantity + stmt.excluded.quantity,
+            "unit_price": stmt.excluded.unit_price,
+            "updated_at": func.now(),
+        }
     )
+    
+    return write_cart_line(db, stmt)
 
 
-@router.post("/items", response_model=CartResponse)
-def add_item_to_cart(
-    item_data: CartItemCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Agregar un producto al carrito"""
-    # Verificar que el producto existe
-    product = db.query(Product).filter(Product.id == item_data.product_id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Producto no encontrado"
+def read_cart(db: Session, user_id: int) -> CartRow:
+    """Leer el carrito del usuario con sus items y productos, solo las columnas de la respuesta"""
+    row = db.query(*CART_ROW_COLUMNS).filter(Cart.user_id == user_id).first()
+    if row is None:
+        get_or_create_cart(user_id, db)
+        row = db.query(*CART_ROW_COLUMNS).filter(Cart.user_id == user_id).first()
+    cart_id, cart_user_id, created_at, updated_at = row
+    
+    # Items y productos en una sola consulta
+    items = []
+    stale_item_ids = []
+    item_rows = db.query(CartItem.id, CartItem.quantity, CartItem.unit_price, *PRODUCT_ROW_COLUMNS).join(
+        Product, Product.id == CartItem.product_id
+    ).filter(CartItem.cart_id == cart_id).order_by(CartItem.id)
+    for item_id, quantity, unit_price, *product_values in item_rows:
+        product = ProductRow(*product_values)
+        # Si el producto cambió de precio el item se responde y se guarda con el precio actual
+        if product.price != unit_price:
+            stale_item_ids.append(item_id)
+        items.append(CartItemRow(
+            item_id, product.id, product, quantity, product.price, product.price * quantity
+        ))
+    
+    # Solo se abre una escritura si hubo cambios de precio
+    if stale_item_ids:
+        current_price = select(Product.price).where(Product.id == CartItem.product_id).scalar_subquery()
+        db.query(CartItem).filter(CartItem.id.in_(stale_item_ids)).update(
+            {CartItem.unit_price: current_price}, synchronize_session=False
         )
+        db.commit()
     
+    total = sum((item.subtotal for item in items), Decimal("0.00"))
+    return CartRow(cart_id, cart_user_id, items, total, created_at, updated_at)
+
+
+@router.get("", response_model=CartResponse, response_class=FastJSONResponse)
+async def get_cart(
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+):
+    """Obtener el carrito del usuario actual"""
+    return FastJSONResponse(await run_db(db, read_cart, current_user.id))
+
+
+def add_cart_item(
+    db: Session,
+    user_id: int,
+    item_data: CartItemCreate,
+    return_mode: str
+) -> Union[CartChangeResponse, FastJSONResponse]:
+    """Agregar un producto al carrito del usuario"""
     if item_data.quantity <= 0:
+        # Un producto inexistente se reporta antes que la cantidad inválida
+        if not db.query(Product.id).filter(Product.id == item_data.product_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="La cantidad debe ser mayor a 0"
         )
     
-    cart = get_or_create_cart(current_user.id, db)
-    
-    # Verificar si el producto ya está en el carrito
-    existing_item = db.query(CartItem).filter(
-        CartItem.cart_id == cart.id,
-        CartItem.product_id == item_data.product_id
-    ).first()
+    line = upsert_cart_item(user_id, item_data.product_id, item_data.quantity, db)
     
-    if existing_item:
-        # Actualizar cantidad
-        existing_item.quantity += item_data.quantity
-        existing_item.unit_price = product.price  # Actualizar precio
-        db.commit()
-        db.refresh(existing_item)
-    else:
-        # Crear nuevo item
-        new_item = CartItem(
-            cart_id=cart.id,
-            product_id=item_data.product_id,
-            quantity=item_data.quantity,
-            unit_price=product.price
-        )
-        db.add(new_item)
-        db.commit()
-        db.refresh(new_item)
+    if line is None:
+        # Sin fila insertada: el producto no existe o el usuario aún no tiene carrito
+        if not db.query(Product.id).filter(Product.id == item_data.product_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado"
+            )
+        get_or_create_cart(user_id, db)
+        line = upsert_cart_item(user_id, item_data.product_id, item_data.quantity, db)
     
-    # Retornar carrito actualizado
-    return get_cart(current_user, db)
+    return finish_cart_change(db, user_id, cart_change_from_line(line), return_mode)
 
 
-@router.put("/items/{item_id}", response_model=CartResponse)
-def update_cart_item(
+@router.post("/items", response_model=Union[CartResponse, CartChangeResponse])
+async def add_item_to_cart(
+    item_data: CartItemCreate,
+    return_mode: str = RETURN_MODE,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+):
+    """Agregar un producto al carrito"""
+    return await run_db(db, add_cart_item, current_user.id, item_data, return_mode)
+
+
+def change_cart_item(
+    db: Session,
+    user_id: int,
     item_id: int,
     item_data: CartItemUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Actualizar la cantidad de un item en el carrito"""
-    cart = get_or_create_cart(current_user.id, db)
-    
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == item_id,
-        CartItem.cart_id == cart.id
-    ).first()
+    return_mode: str
+) -> Union[CartChangeResponse, FastJSONResponse]:
+    """Cambiar la cantidad de un item del carrito del usuario
     
-    if not cart_item:
+    Un UPDATE ... RETURNING cambia la cantidad y toma el precio actual del producto.
+    """
+    if item_data.quantity is not None and item_data.quantity <= 0:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item no encontrado en el carrito"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La cantidad debe ser mayor a 0"
         )
     
+    values = {CartItem.unit_price: select(Product.price).where(Product.id == CartItem.product_id).scalar_subquery()}
     if item_data.quantity is not None:
-        if item_data.quantity <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="La cantidad debe ser mayor a 0"
-            )
-        cart_item.quantity = item_data.quantity
-        # Actualizar precio del producto
-        cart_item.unit_price = cart_item.product.price
+        values[CartItem.quantity] = item_data.quantity
     
-    db.commit()
+    line = write_cart_line(db, update(CartItem).where(user_cart_item(user_id, item_id)).values(values))
+    if line is None:
+        raise item_not_found()
+    
+    return finish_cart_change(db, user_id, cart_change_from_line(line), return_mode)
+
+
+@router.put("/items/{item_id}", response_model=Union[CartResponse, CartChangeResponse])
+async def update_cart_item(
+    item_id: int,
+    item_data: CartItemUpdate,
+    return_mode: str = RETURN_MODE,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+):
+    """Actualizar la cantidad de un item en el carrito"""
+    return await run_db(db, change_cart_item, current_user.id, item_id, item_data, return_mode)
+
+
+def delete_cart_item(
+    db: Session,
+    user_id: int,
+    item_id: int,
+    return_mode: str
+) -> Union[CartChangeResponse, FastJSONResponse]:
+    """Eliminar un item del carrito del usuario con un DELETE ... RETURNING"""
+    removed = write_cart_line(
+        db,
+        delete(CartItem).where(user_cart_item(user_id, item_id)),
+        read=select_removed_line,
+        columns=(CartItem.id, CartItem.cart_id)
+    )
+    if removed is None:
+        raise item_not_found()
     
-    return get_cart(current_user, db)
+    cart_id, total = removed
+    return finish_cart_change(db, user_id, CartChangeResponse(cart_id=cart_id, item=None, total=total), return_mode)
 
 
-@router.delete("/items/{item_id}", response_model=CartResponse)
-def remove_item_from_cart(
+@router.delete("/items/{item_id}", response_model=Union[CartResponse, CartChangeResponse])
+async def remove_item_from_cart(
     item_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    return_mode: str = RETURN_MODE,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
 ):
     """Eliminar un item del carrito"""
-    cart = get_or_create_cart(current_user.id, db)
+    return await run_db(db, delete_cart_item, current_user.id, item_id, return_mode)
+
+
+def empty_cart(db: Session, user_id: int, return_mode: str) -> Union[CartResponse, CartChangeResponse]:
+    """Eliminar todos los items del carrito del usuario"""
+    cart = get_or_create_cart(user_id, db)
     
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == item_id,
-        CartItem.cart_id == cart.id
-    ).first()
+    # Eliminar todos los items en una sola sentencia, sin cargarlos
+    db.query(CartItem).filter(CartItem.cart_id == cart.id).delete(synchronize_session=False)
     
-    if not cart_item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item no encontrado en el carrito"
+    if return_mode == "minimal":
+        response = CartChangeResponse(cart_id=cart.id, item=None, total=Decimal("0.00"))
+    else:
+        response = CartResponse(
+            id=cart.id,
+            user_id=cart.user_id,
+            items=[],
+            total=Decimal("0.00"),
+            created_at=cart.created_at,
+            updated_at=cart.updated_at
         )
     
-    db.delete(cart_item)
     db.commit()
-    
-    return get_cart(current_user, db)
+    return response
 
 
-@router.delete("", response_model=CartResponse)
-def clear_cart(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+@router.delete("", response_model=Union[CartResponse, CartChangeResponse])
+async def clear_cart(
+    return_mode: str = RETURN_MODE,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
 ):
     """Vaciar el carrito completamente"""
-    cart = get_or_create_cart(current_user.id, db)
-    
-    # Eliminar todos los items
-    db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
-    db.commit()
-    
-    return get_cart(current_user, db)
-
+    return await run_db(db, empty_cart, current_user.id, return_mode)
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+from typing import Optional, Union
+from app.database import get_db
+from app.schemas.catalog import CatalogSnapshot, CatalogDelta
+from app.core.catalog import catalog_snapshot, build_catalog_delta, compress_body, choose_encoding
+from app.core.response_cache import CATALOG_CACHE_CONTROL, etag_matches
+from app.core.serialization import dump_json
+
+router = APIRouter(prefix="/catalog", tags=["catálogo"])
+
+
+def encoded_response(body: bytes, encoding: str, headers: dict) -> Response:
+    """Respuesta JSON ya codificada (gzip/br) según lo negociado"""
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("", response_model=Union[CatalogSnapshot, CatalogDelta])
+def get_catalog(
+    since: Optional[int] = Query(None, ge=0),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Descargar el catálogo completo (productos y categorías) para las terminales
+
+    El snapshot se arma una vez por versión del catálogo y se guarda ya comprimido;
+    cada cambio de un admin lo vuelve a generar en segundo plano. Con
+    `?since=<version>` se devuelven solo los productos creados o modificados
+    después de esa versión, los ids de los borrados y las categorías.
+    """
+    if since is not None:
+        delta = build_catalog_delta(db, since)
+        if delta is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Versión de catálogo desconocida, descarga el catálogo completo"
+            )
+        encodings = compress_body(dump_json(delta))
+        encoding = choose_encoding(accept_encoding, encodings)
+        return encoded_response(encodings[encoding], encoding, {"X-Catalog-Version": str(delta.version)})
+
+    blob = catalog_snapshot.current(db)
+    encoding, body = blob.select(accept_encoding)
+    headers = {
+        "ETag": blob.etag(encoding),
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "X-Catalog-Version": str(blob.version)
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return encoded_response(body, encoding, headers)
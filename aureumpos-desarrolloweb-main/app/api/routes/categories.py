@@ -1,53 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session, Query
+from typing import List, Optional
+from app.database import get_db, get_session, run_db
 from app.models.category import Category
-from app.models.product import Product
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
 from app.api.deps import get_current_admin
-from app.models.user import User
+from app.core.principal import UserPrincipal
+from app.core.response_cache import catalog_cache
+from app.core.catalog import bump_catalog_version, catalog_changed
+from app.core.read_models import CategoryRow, product_counts_subquery, query_category_rows, category_rows
 
 router = APIRouter(prefix="/categories", tags=["categorías"])
 
 
+def query_categories_with_count(db: Session) -> Query:
+    """Categorías junto con su conteo de productos en una sola consulta agrupada"""
+    product_counts = product_counts_subquery(db)
+    return db.query(
+        Category,
+        func.coalesce(product_counts.c.product_count, 0).label("product_count")
+    ).outerjoin(product_counts, product_counts.c.category_id == Category.id)
+
+
+def build_category_response(category: Category, product_count: int) -> CategoryResponse:
+    """Construir la respuesta de una categoría con su conteo de productos"""
+    return CategoryResponse(
+        id=category.id,
+        name=category.name,
+        image_url=category.image_url,
+        created_at=category.created_at,
+        updated_at=category.updated_at,
+        product_count=product_count
+    )
+
+
+def list_categories(db: Session) -> List[CategoryRow]:
+    """Leer todas las categorías con su conteo de productos, solo las columnas de la respuesta"""
+    return category_rows(query_category_rows(db).order_by(Category.id))
+
+
 @router.get("", response_model=List[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
-    """Obtener todas las categorías con conteo de productos"""
-    categories = db.query(Category).all()
-    result = []
-    for category in categories:
-        product_count = db.query(Product).filter(Product.category_id == category.id).count()
-        category_dict = {
-            **category.__dict__,
-            "product_count": product_count
-        }
-        result.append(CategoryResponse(**category_dict))
-    return result
+async def get_categories(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_session)):
+    """Obtener todas las categorías con conteo de productos (con caché y ETag)"""
+    return await catalog_cache.respond(("categories",), if_none_match, lambda: run_db(db, list_categories))
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    """Obtener una categoría por ID"""
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Categoría no encontrada"
+async def get_category(
+    category_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session)
+):
+    """Obtener una categoría por ID (con caché y ETag)"""
+    async def read_category():
+        row = await run_db(
+            db, lambda session: query_category_rows(session).filter(Category.id == category_id).first()
         )
-    product_count = db.query(Product).filter(Product.category_id == category.id).count()
-    category_dict = {
-        **category.__dict__,
-        "product_count": product_count
-    }
-    return CategoryResponse(**category_dict)
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Categoría no encontrada"
+            )
+        return CategoryRow(*row)
+    
+    return await catalog_cache.respond(("category", category_id), if_none_match, read_category)
 
 
 @router.post("", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 def create_category(
     category_data: CategoryCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Crear una nueva categoría (solo administradores)"""
     # Verificar si ya existe una categoría con ese nombre
@@ -60,30 +85,31 @@ def create_category(
     
     new_category = Category(**category_data.model_dump())
     db.add(new_category)
+    bump_catalog_version(db)
     db.commit()
+    catalog_changed(background_tasks)
     db.refresh(new_category)
     
-    category_dict = {
-        **new_category.__dict__,
-        "product_count": 0
-    }
-    return CategoryResponse(**category_dict)
+    return build_category_response(new_category, 0)
 
 
 @router.put("/{category_id}", response_model=CategoryResponse)
 def update_category(
     category_id: int,
     category_data: CategoryUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Actualizar una categoría (solo administradores)"""
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
+    row = query_categories_with_count(db).filter(Category.id == category_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Categoría no encontrada"
         )
+    # Renombrar la categoría no cambia su conteo de productos
+    category, product_count = row
     
     # Verificar nombre único si se está cambiando
     if category_data.name and category_data.name != category.name:
@@ -99,33 +125,31 @@ def update_category(
     for field, value in update_data.items():
         setattr(category, field, value)
     
+    bump_catalog_version(db)
     db.commit()
+    catalog_changed(background_tasks)
     db.refresh(category)
     
-    product_count = db.query(Product).filter(Product.category_id == category.id).count()
-    category_dict = {
-        **category.__dict__,
-        "product_count": product_count
-    }
-    return CategoryResponse(**category_dict)
+    return build_category_response(category, product_count)
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_category(
     category_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Eliminar una categoría (solo administradores)"""
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
+    row = query_categories_with_count(db).filter(Category.id == category_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Categoría no encontrada"
         )
     
     # Verificar si tiene productos asociados
-    product_count = db.query(Product).filter(Product.category_id == category.id).count()
+    category, product_count = row
     if product_count > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -133,6 +157,8 @@ def delete_category(
         )
     
     db.delete(category)
+    bump_catalog_version(db)
     db.commit()
+    catalog_changed(background_tasks)
     return None
 
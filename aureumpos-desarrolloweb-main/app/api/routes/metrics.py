@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Response
+from app.core.metrics import pool_metrics, render_prometheus, PROMETHEUS_CONTENT_TYPE
+
+router = APIRouter(prefix="/metrics", tags=["métricas"])
+
+
+@router.get("", response_class=Response)
+def get_metrics():
+    """Métricas de este worker en formato Prometheus
+
+    Latencia, sentencias SQL, tiempo en la base de datos y tamaño de respuesta
+    por ruta, duración de cada sentencia y estado del pool de conexiones.
+    """
+    return Response(content=render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/pool")
+def get_pool_metrics():
+    """Estado y contadores del pool de conexiones a la base de datos"""
+    return pool_metrics.snapshot()
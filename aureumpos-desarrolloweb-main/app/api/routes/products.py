@@ -1,54 +1,380 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query as QueryParam, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, func, insert, select
+from sqlalchemy.orm import Session, Query
+from typing import IO, Iterator, List, Literal, Optional
+from decimal import Decimal
+import csv
+import tempfile
+from app.database import get_db, get_session, run_db
 from app.models.product import Product
 from app.models.category import Category
 from app.models.cart import CartItem
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductPage,
+    ProductPriceChange, ProductPriceChangeResult, ProductImportError, ProductImportResult
+)
 from app.api.deps import get_current_admin
-from app.models.user import User
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.search import search_products
+from app.core.catalog_io import EXPORT_COLUMNS, read_import_rows, parse_import_row, format_export_rows
+from app.core.principal import UserPrincipal
+from app.core.response_cache import catalog_cache
+from app.core.serialization import FastJSONResponse
+from app.core.read_models import PRODUCT_ROW_COLUMNS, ProductRow, ProductPageRows, product_rows
+from app.core.catalog import bump_catalog_version, record_deleted_product, catalog_changed
 
 router = APIRouter(prefix="/products", tags=["productos"])
 
+# Importación/exportación masiva
+BULK_BATCH_SIZE = 1000
+BULK_MAX_REPORTED_ERRORS = 1000
+BULK_SPOOL_MAX_BYTES = 4 * 1024 * 1024  # Por encima de esto el archivo subido va a disco
+BULK_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Máximo de productos por llamada a GET /products cuando el cliente pide `limit`
+LIST_MAX_LIMIT = 1000
+
+
+# Columnas por las que se puede ordenar el catálogo paginado y cómo leer su valor del cursor
+SORT_COLUMNS = {
+    "id": (Product.id, int),
+    "name": (Product.name, str),
+    "price": (Product.price, Decimal),
+}
+
+
+def filter_products(query: Query, category_id: Optional[int], search: Optional[str]) -> Query:
+    """Aplicar los filtros de categoría y búsqueda al listado de productos"""
+    if category_id:
+        query = query.filter(Product.category_id == category_id)
+    
+    if search:
+        search_term = f"%{search.lower()}%"
+        query = query.filter(Product.name.ilike(search_term))
+    
+    return query
+
+
+def list_products(
+    db: Session,
+    category_id: Optional[int],
+    search: Optional[str],
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> List[ProductRow]:
+    """Leer los productos filtrados por categoría o búsqueda, solo las columnas de la respuesta"""
+    query = filter_products(db.query(*PRODUCT_ROW_COLUMNS), category_id, search)
+    if after_id is not None:
+        query = query.filter(Product.id > after_id)
+    query = query.order_by(Product.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return product_rows(query)
+
 
 @router.get("", response_model=List[ProductResponse])
-def get_products(
+async def get_products(
     category_id: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = QueryParam(None, ge=1, le=LIST_MAX_LIMIT),
+    after_id: Optional[int] = QueryParam(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session)
+):
+    """Obtener los productos ordenados por id, opcionalmente filtrados por categoría o búsqueda
+    
+    Sin `limit` devuelve la lista completa, como esperan los clientes existentes;
+    con `limit` devuelve hasta ese máximo de productos con id mayor que `after_id`.
+    La respuesta se sirve desde la caché del catálogo con un ETag; si el cliente
+    envía If-None-Match con ese ETag recibe 304 sin cuerpo.
+    """
+    return await catalog_cache.respond(
+        ("products", category_id, search, limit, after_id),
+        if_none_match,
+        lambda: run_db(db, list_products, category_id, search, limit, after_id)
+    )
+
+
+def read_products_page(
+    db: Session,
+    category_id: Optional[int],
+    search: Optional[str],
+    sort: str,
+    limit: int,
+    after: Optional[str]
+) -> ProductPageRows:
+    """Leer una página del catálogo a partir del cursor `after`"""
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-")
+    sort_column, sort_type = SORT_COLUMNS[sort_key]
+    
+    query = filter_products(db.query(*PRODUCT_ROW_COLUMNS), category_id, search)
+    
+    # Continuar justo después de la última fila de la página anterior
+    if sort_key == "id":
+        cursor = decode_cursor(after, 1)
+        if cursor is not None:
+            try:
+                last_id = int(cursor[0])
+            except (ArithmeticError, ValueError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor de paginación inválido"
+                )
+            query = query.filter(Product.id < last_id if descending else Product.id > last_id)
+        order_by = [Product.id.desc() if descending else Product.id.asc()]
+    else:
+        cursor = decode_cursor(after, 2)
+        if cursor is not None:
+            try:
+                last_value, last_id = sort_type(cursor[0]), int(cursor[1])
+                # Decimal acepta "NaN" e "Infinity", que no son un precio
+                if isinstance(last_value, Decimal) and not last_value.is_finite():
+                    raise ValueError(last_value)
+            except (ArithmeticError, ValueError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor de paginación inválido"
+                )
+            if descending:
+                query = query.filter(or_(
+                    sort_column < last_value,
+                    and_(sort_column == last_value, Product.id < last_id)
+                ))
+            else:
+                query = query.filter(or_(
+                    sort_column > last_value,
+                    and_(sort_column == last_value, Product.id > last_id)
+                ))
+        if descending:
+            order_by = [sort_column.desc(), Product.id.desc()]
+        else:
+            order_by = [sort_column.asc(), Product.id.asc()]
+    
+    # Se pide una fila extra para saber si hay más páginas
+    products = product_rows(query.order_by(*order_by).limit(limit + 1))
+    has_more = len(products) > limit
+    products = products[:limit]
+    
+    next_cursor = None
+    if has_more:
+        last = products[-1]
+        if sort_key == "id":
+            next_cursor = encode_cursor([last.id])
+        else:
+            next_cursor = encode_cursor([getattr(last, sort_key), last.id])
+    
+    return ProductPageRows(
+        items=products,
+        limit=limit,
+        has_more=has_more,
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/page", response_model=ProductPage, response_class=FastJSONResponse)
+async def get_products_page(
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    sort: str = QueryParam("id", pattern="^-?(id|name|price)$"),
+    limit: int = QueryParam(50, ge=1, le=200),
+    after: Optional[str] = None,
+    db: Session = Depends(get_session)
+):
+    """Obtener una página del catálogo usando paginación por cursor (keyset)
+    
+    `sort` acepta id, name o price; con prefijo "-" ordena de forma descendente.
+    `after` es el `next_cursor` devuelto por la página anterior.
+    """
+    return FastJSONResponse(await run_db(db, read_products_page, category_id, search, sort, limit, after))
+
+
+def find_products(db: Session, q: str, category_id: Optional[int], limit: int) -> List[ProductRow]:
+    """Leer los productos que coinciden con la búsqueda, por relevancia"""
+    query = filter_products(db.query(*PRODUCT_ROW_COLUMNS), category_id, None)
+    query = search_products(query, q)
+    if query is None:
+        return []
+    return product_rows(query.limit(limit))
+
+
+@router.get("/search", response_model=List[ProductResponse], response_class=FastJSONResponse)
+async def search_products_by_name(
+    q: str = QueryParam(..., min_length=1, max_length=100),
+    category_id: Optional[int] = None,
+    limit: int = QueryParam(20, ge=1, le=100),
+    db: Session = Depends(get_session)
+):
+    """Buscar productos por nombre ordenados por relevancia
+    
+    Ignora mayúsculas y acentos ("cafe" encuentra "Café"). Usa el índice
+    trigram de PostgreSQL o la tabla FTS5 en SQLite.
+    """
+    return FastJSONResponse(await run_db(db, find_products, q, category_id, limit))
+
+
+def describe_import_error(error: ValueError) -> str:
+    """Mensaje legible de un error de validación de una fila importada"""
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+        )
+    return str(error)
+
+
+def import_products(file: IO[bytes], file_format: str, db: Session) -> ProductImportResult:
+    """Validar e insertar por lotes los productos de un archivo CSV/NDJSON"""
+    # Una sola consulta de categorías para todo el archivo
+    categories = db.query(Category.id, Category.name).all()
+    category_ids = {category_id for category_id, _ in categories}
+    category_names = {name.lower(): category_id for category_id, name in categories}
+    
+    created = 0
+    error_count = 0
+    errors = []
+    batch = []
+    # Los productos nuevos quedan con id mayor al último existente
+    last_id_before = db.query(func.coalesce(func.max(Product.id), 0)).scalar()
+    
+    try:
+        for line, row in read_import_rows(file, file_format):
+            try:
+                batch.append(parse_import_row(row, category_ids, category_names))
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < BULK_MAX_REPORTED_ERRORS:
+                    errors.append(ProductImportError(line=line, error=describe_import_error(e)))
+            
+            if len(batch) >= BULK_BATCH_SIZE:
+                # executemany: un INSERT por lote
+                db.execute(insert(Product), batch)
+                created += len(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo inválido: {e}"
+        )
+    
+    if batch:
+        db.execute(insert(Product), batch)
+        created += len(batch)
+    
+    if created:
+        # La versión se toma al final: la fila de catalog_state queda bloqueada solo hasta el commit,
+        # no durante toda la importación
+        db.query(Product).filter(Product.id > last_id_before).update(
+            {Product.catalog_version: bump_catalog_version(db)}, synchronize_session=False
+        )
+    
+    db.commit()
+    
+    return ProductImportResult(created=created, error_count=error_count, errors=errors)
+
+
+@router.post("/bulk", response_model=ProductImportResult)
+async def bulk_import_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file_format: Optional[Literal["csv", "ndjson"]] = QueryParam(None, alias="format"),
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Importar productos en bloque desde CSV o NDJSON (solo administradores)
+    
+    El cuerpo de la petición es el archivo. El formato se toma de `?format=`
+    o del Content-Type (text/csv, application/x-ndjson). Las filas inválidas
+    se reportan con su número de línea y no impiden importar las demás.
+    """
+    if file_format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        file_format = BULK_FORMATS.get(content_type)
+        if file_format is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Formato no soportado, usa text/csv o application/x-ndjson"
+            )
+    
+    # El cuerpo se recibe por partes y se guarda en un archivo temporal con memoria acotada
+    with tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        result = await run_in_threadpool(import_products, spool, file_format, db)
+    
+    await run_in_threadpool(catalog_changed, background_tasks)
+    return result
+
+
+@router.get("/export")
+def export_products(
+    file_format: Literal["csv", "ndjson"] = QueryParam("csv", alias="format"),
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
-    """Obtener todos los productos, opcionalmente filtrados por categoría o búsqueda"""
-    query = db.query(Product)
+    """Exportar el catálogo en CSV o NDJSON (solo administradores)
     
+    Las filas se leen por lotes con un cursor del servidor y se envían a
+    medida que se leen, sin cargar la tabla completa en memoria.
+    """
+    query = select(*(getattr(Product, column) for column in EXPORT_COLUMNS)).order_by(Product.id)
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        query = query.where(Product.category_id == category_id)
     
-    if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(Product.name.ilike(search_term))
+    def generate() -> Iterator[str]:
+        result = db.execute(query.execution_options(yield_per=BULK_BATCH_SIZE))
+        header = True
+        for rows in result.partitions():
+            yield format_export_rows(rows, file_format, header)
+            header = False
+        if header and file_format == "csv":
+            yield format_export_rows([], file_format, header)
     
-    products = query.all()
-    return products
+    media_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    extension = "csv" if file_format == "csv" else "ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=productos.{extension}"}
+    )
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Obtener un producto por ID"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Producto no encontrado"
+async def get_product(
+    product_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_session)
+):
+    """Obtener un producto por ID (con caché y ETag, como el listado)"""
+    async def read_product():
+        row = await run_db(
+            db, lambda session: session.query(*PRODUCT_ROW_COLUMNS).filter(Product.id == product_id).first()
         )
-    return product
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado"
+            )
+        return ProductRow(*row)
+    
+    return await catalog_cache.respond(("product", product_id), if_none_match, read_product)
 
 
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(
     product_data: ProductCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Crear un nuevo producto (solo administradores)"""
     # Verificar que la categoría existe
@@ -59,20 +385,81 @@ def create_product(
             detail="Categoría no encontrada"
         )
     
-    new_product = Product(**product_data.model_dump())
+    new_product = Product(**product_data.model_dump(), catalog_version=bump_catalog_version(db))
     db.add(new_product)
     db.commit()
+    catalog_changed(background_tasks)
     db.refresh(new_product)
     
     return new_product
 
 
+@router.post("/prices", response_model=ProductPriceChangeResult)
+def change_product_prices(
+    price_change: ProductPriceChange,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Cambiar precios en bloque por categoría o lista de productos (solo administradores)
+    
+    `percentage` aplica un porcentaje (10 sube 10%, -15 baja 15%) y `fixed`
+    suma un monto fijo. Los carritos afectados se actualizan en la misma transacción.
+    """
+    if price_change.category_id is None and not price_change.product_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indica una categoría o una lista de productos"
+        )
+    
+    conditions = []
+    if price_change.category_id is not None:
+        conditions.append(Product.category_id == price_change.category_id)
+    if price_change.product_ids:
+        conditions.append(Product.id.in_(price_change.product_ids))
+    
+    if price_change.mode == "percentage":
+        factor = 1 + price_change.value / Decimal("100")
+        new_price = func.round(Product.price * factor, 2)
+    else:
+        new_price = Product.price + price_change.value
+    
+    # Ningún precio puede quedar negativo
+    negative = db.query(func.count(Product.id)).filter(*conditions, new_price < 0).scalar()
+    if negative:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El cambio dejaría {negative} producto(s) con precio negativo"
+        )
+    
+    updated_products = db.query(Product).filter(*conditions).update(
+        {Product.price: new_price, Product.updated_at: func.now(), Product.catalog_version: bump_catalog_version(db)},
+        synchronize_session=False
+    )
+    
+    # Repreciar todos los carritos afectados en una sola sentencia
+    affected_ids = select(Product.id).where(*conditions)
+    current_price = select(Product.price).where(Product.id == CartItem.product_id).scalar_subquery()
+    updated_cart_items = db.query(CartItem).filter(CartItem.product_id.in_(affected_ids)).update(
+        {CartItem.unit_price: current_price}, synchronize_session=False
+    )
+    
+    db.commit()
+    catalog_changed(background_tasks)
+    
+    return ProductPriceChangeResult(
+        updated_products=updated_products,
+        updated_cart_items=updated_cart_items
+    )
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: int,
     product_data: ProductUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Actualizar un producto (solo administradores)"""
     product = db.query(Product).filter(Product.id == product_id).first()
@@ -93,22 +480,22 @@ def update_product(
     
     # Guardar precio anterior para actualizar carritos
     old_price = product.price
-    new_price = product_data.price if product_data.price else product.price
+    new_price = product_data.price if product_data.price is not None else product.price
     
     # Actualizar campos
     update_data = product_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
+    product.catalog_version = bump_catalog_version(db)
     
-    db.commit()
-    
-    # Si el precio cambió, actualizar los precios en los carritos
+    # Si el precio cambió, actualizar los carritos con un solo UPDATE en la misma transacción
     if old_price != new_price:
-        cart_items = db.query(CartItem).filter(CartItem.product_id == product_id).all()
-        for cart_item in cart_items:
-            cart_item.unit_price = new_price
-        db.commit()
+        db.query(CartItem).filter(CartItem.product_id == product_id).update(
+            {CartItem.unit_price: new_price}, synchronize_session=False
+        )
     
+    db.commit()
+    catalog_changed(background_tasks)
     db.refresh(product)
     return product
 
@@ -116,8 +503,9 @@ def update_product(
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(
     product_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: UserPrincipal = Depends(get_current_admin)
 ):
     """Eliminar un producto (solo administradores)"""
     product = db.query(Product).filter(Product.id == product_id).first()
@@ -128,6 +516,8 @@ def delete_product(
         )
     
     db.delete(product)
+    record_deleted_product(db, product_id, bump_catalog_version(db))
     db.commit()
+    catalog_changed(background_tasks)
     return None
 
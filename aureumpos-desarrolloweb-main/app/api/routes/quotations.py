@@ -1,183 +1,412 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import String, and_, delete, func, insert, or_, select, type_coerce
+from sqlalchemy.orm import Session, selectinload, joinedload
+from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
-import io
-from app.database import get_db
+import os
+from app.database import get_db, get_session, run_db
 from app.models.quotation import Quotation, QuotationItem
 from app.models.cart import Cart, CartItem
+from app.models.product import Product
 from app.models.user import User
-from app.schemas.quotation import QuotationResponse, QuotationItemResponse
-from app.api.deps import get_current_active_user
-from app.core.pdf_generator import generate_quotation_pdf
+from app.schemas.quotation import (
+    QuotationResponse, QuotationItemResponse, QuotationPage, QuotationExportProgress
+)
+from app.schemas.user import UserResponse
+from app.config import settings
+from app.api.deps import get_current_active_user, get_current_principal, get_current_admin
+from app.core.principal import UserPrincipal
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.pdf_cache import pdf_cache_key, open_quotation_pdf, iter_pdf_file
+from app.core.response_cache import etag_matches
+from app.core.serialization import FastJSONResponse
+from app.core.read_models import (
+    QUOTATION_ROW_COLUMNS, QuotationRow, QuotationSummaryRow, QuotationPageRows, quotation_rows, load_quotation_items
+)
+from app.core.pdf_export import QuotationPdfJob, start_export, get_export_progress, stream_quotations_zip
 
 router = APIRouter(prefix="/quotations", tags=["cotizaciones"])
 
+# Máximo de cotizaciones por llamada a GET /quotations cuando el cliente pide `limit` o `after`
+LIST_MAX_LIMIT = 1000
 
-def generate_quotation_number() -> str:
-    """Generar un número único de cotización"""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    return f"COT-{timestamp}"
 
-
-@router.post("", response_model=QuotationResponse, status_code=status.HTTP_201_CREATED)
-def create_quotation(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Crear una cotización a partir del carrito actual"""
-    cart = db.query(Cart).filter(Cart.user_id == current_user.id).first()
+def insert_quotation(db: Session, user_id: int, clear_cart: bool) -> QuotationResponse:
+    """Crear la cotización del carrito del usuario en una sola transacción
+    
+    Una consulta lee los items del carrito con su producto, un INSERT ... RETURNING
+    crea la cotización y un INSERT de varias filas ... RETURNING crea sus items.
+    La respuesta se arma con lo devuelto, sin volver a consultar.
+    Con `clear_cart` solo se borran los items leídos, bloqueados hasta el commit.
+    """
+    cart_query = (
+        select(CartItem.id, CartItem.product_id, CartItem.quantity, Product.name, Product.price)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(Cart.user_id == user_id)
+        .order_by(CartItem.id)
+    )
+    if clear_cart:
+        # FOR UPDATE: un cambio de cantidad simultáneo espera al commit, así no se borra
+        # una línea distinta de la cotizada (SQLite no tiene FOR UPDATE y se omite)
+        cart_query = cart_query.with_for_update(of=CartItem)
+    cart_rows = db.execute(cart_query).all()
     
-    if not cart or not cart.items:
+    if not cart_rows:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El carrito está vacío"
         )
     
-    # Calcular total
-    total_amount = Decimal("0.00")
-    quotation_items = []
-    
-    for cart_item in cart.items:
-        # Usar precio actualizado del producto
-        unit_price = cart_item.product.price
-        subtotal = unit_price * cart_item.quantity
-        total_amount += subtotal
-        
-        # Crear item de cotización
-        quotation_item = QuotationItem(
-            product_id=cart_item.product_id,
-            product_name=cart_item.product.name,
-            quantity=cart_item.quantity,
-            unit_price=unit_price,
-            subtotal=subtotal
-        )
-        quotation_items.append(quotation_item)
+    # Usar precio actualizado del producto
+    item_values = [
+        {
+            "product_id": row.product_id,
+            "product_name": row.name,
+            "quantity": row.quantity,
+            "unit_price": row.price,
+            "subtotal": row.price * row.quantity
+        }
+        for row in cart_rows
+    ]
+    total_amount = sum((values["subtotal"] for values in item_values), Decimal("0.00"))
     
-    # Crear cotización
-    quotation_number = generate_quotation_number()
-    new_quotation = Quotation(
-        quotation_number=quotation_number,
-        user_id=current_user.id,
-        total_amount=total_amount,
-        items=quotation_items
+    # Crear cotización (el número lo asigna la base de datos en el INSERT)
+    quotation = db.execute(
+        insert(Quotation)
+        .values(user_id=user_id, total_amount=total_amount)
+        .returning(Quotation.id, Quotation.quotation_number, Quotation.created_at)
+    ).one()
+    
+    for values in item_values:
+        values["quotation_id"] = quotation.id
+    # Un producto aparece una sola vez por carrito: los ids devueltos se asocian por product_id
+    # (sin exigir orden a RETURNING, así SQLAlchemy agrupa las filas en un solo INSERT)
+    item_ids = dict(
+        (product_id, item_id)
+        for item_id, product_id in db.execute(
+            insert(QuotationItem).returning(QuotationItem.id, QuotationItem.product_id),
+            item_values
+        )
     )
     
-    db.add(new_quotation)
+    if clear_cart:
+        # Los items agregados después de la lectura siguen en el carrito
+        db.execute(delete(CartItem).where(CartItem.id.in_([row.id for row in cart_rows])))
+    
     db.commit()
-    db.refresh(new_quotation)
     
-    # Preparar respuesta
     items_response = [
         QuotationItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            product_name=item.product_name,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            subtotal=item.subtotal
+            id=item_ids[values["product_id"]],
+            product_id=values["product_id"],
+            product_name=values["product_name"],
+            quantity=values["quantity"],
+            unit_price=values["unit_price"],
+            subtotal=values["subtotal"]
         )
-        for item in new_quotation.items
+        for values in item_values
     ]
     
     return QuotationResponse(
-        id=new_quotation.id,
-        quotation_number=new_quotation.quotation_number,
-        user_id=new_quotation.user_id,
-        total_amount=new_quotation.total_amount,
+        id=quotation.id,
+        quotation_number=quotation.quotation_number,
+        user_id=user_id,
+        total_amount=total_amount,
         items=items_response,
-        created_at=new_quotation.created_at
+        created_at=quotation.created_at
+    )
+
+
+@router.post("", response_model=QuotationResponse, status_code=status.HTTP_201_CREATED)
+async def create_quotation(
+    clear_cart: bool = False,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+):
+    """Crear una cotización a partir del carrito actual
+    
+    Con `clear_cart=true` el carrito se vacía en la misma transacción.
+    """
+    return await run_db(db, insert_quotation, current_user.id, clear_cart)
+
+
+def read_user_quotations(db: Session, user_id: int) -> List[QuotationRow]:
+    """Leer las cotizaciones del usuario con sus items, solo las columnas de la respuesta"""
+    quotations = quotation_rows(
+        db.query(*QUOTATION_ROW_COLUMNS).filter(Quotation.user_id == user_id)
+        .order_by(Quotation.created_at.desc(), Quotation.id.desc())
+    )
+    # Los items de todas las cotizaciones se leen en una sola consulta adicional
+    return load_quotation_items(
+        db, quotations, QuotationItem.quotation_id.in_(select(Quotation.id).where(Quotation.user_id == user_id))
     )
 
 
-@router.get("", response_model=List[QuotationResponse])
+@router.get("", response_model=List[QuotationResponse], response_class=FastJSONResponse)
 def get_user_quotations(
-    current_user: User = Depends(get_current_active_user),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT),
+    after: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """Obtener todas las cotizaciones del usuario actual"""
-    quotations = db.query(Quotation).filter(
-        Quotation.user_id == current_user.id
-    ).order_by(Quotation.created_at.desc()).all()
-    
-    result = []
-    for quotation in quotations:
-        items_response = [
-            QuotationItemResponse(
-                id=item.id,
-                product_id=item.product_id,
-                product_name=item.product_name,
-                quantity=item.quantity,
-                unit_price=item.unit_price,
-                subtotal=item.subtotal
+    """Obtener las cotizaciones del usuario actual, de la más reciente a la más antigua
+    
+    Sin `limit` ni `after` devuelve el historial completo, como esperan los clientes
+    existentes. Con ellos devuelve una página como `/quotations/page` (a lo sumo
+    `limit` cotizaciones, o LIST_MAX_LIMIT) y, si hay más, el cursor de la siguiente
+    en el header `X-Next-Cursor`.
+    Se lee por columnas y se serializa en una pasada, sin entidades del ORM ni modelos
+    intermedios: el historial de un cliente puede tener miles de items.
+    """
+    if limit is None and after is None:
+        return FastJSONResponse(read_user_quotations(db, current_user.id))
+    
+    page = read_quotations_page(db, current_user.id, False, limit or LIST_MAX_LIMIT, after)
+    headers = {"X-Next-Cursor": page.next_cursor} if page.has_more else None
+    return FastJSONResponse(page.items, headers=headers)
+
+
+def read_quotations_page(
+    db: Session,
+    user_id: int,
+    summary: bool,
+    limit: int,
+    after: Optional[str]
+) -> QuotationPageRows:
+    """Leer una página del historial de cotizaciones (más recientes primero) a partir del cursor `after`"""
+    created_at = Quotation.created_at
+    stored_as_text = db.get_bind().dialect.name == "sqlite"
+    if stored_as_text:
+        # SQLite guarda created_at como texto ('YYYY-MM-DD HH:MM:SS' de CURRENT_TIMESTAMP), que no
+        # coincide con el formato con microsegundos de un datetime enlazado: se compara el texto tal cual
+        created_at = type_coerce(Quotation.created_at, String)
+    
+    if summary:
+        # Solo encabezados: los items de cada cotización de la página se cuentan con el
+        # índice de quotation_items.quotation_id, sin cargarlos
+        item_count = (
+            select(func.count())
+            .where(QuotationItem.quotation_id == Quotation.id)
+            .scalar_subquery()
+        )
+        query = db.query(*QUOTATION_ROW_COLUMNS, created_at, item_count)
+    else:
+        query = db.query(*QUOTATION_ROW_COLUMNS, created_at)
+    query = query.filter(Quotation.user_id == user_id)
+    
+    # Continuar justo después de la última fila de la página anterior
+    cursor = decode_cursor(after, 2)
+    if cursor is not None:
+        try:
+            last_created_at = cursor[0] if stored_as_text else datetime.fromisoformat(cursor[0])
+            last_id = int(cursor[1])
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor de paginación inválido"
             )
-            for item in quotation.items
-        ]
-        result.append(QuotationResponse(
-            id=quotation.id,
-            quotation_number=quotation.quotation_number,
-            user_id=quotation.user_id,
-            total_amount=quotation.total_amount,
-            items=items_response,
-            created_at=quotation.created_at
+        query = query.filter(or_(
+            created_at < last_created_at,
+            and_(created_at == last_created_at, Quotation.id < last_id)
         ))
     
-    return result
+    # Se pide una fila extra para saber si hay más páginas
+    rows = query.order_by(created_at.desc(), Quotation.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    next_cursor = None
+    if has_more:
+        # Columnas: las de QUOTATION_ROW_COLUMNS (id primero) y luego created_at tal como se compara
+        next_cursor = encode_cursor([rows[-1][5], rows[-1][0]])
+    
+    if summary:
+        items = [
+            QuotationSummaryRow(quotation_id, quotation_number, quotation_user_id, total_amount, item_count, created)
+            for quotation_id, quotation_number, quotation_user_id, total_amount, created, _, item_count in rows
+        ]
+    else:
+        # Los items de la página se leen en una sola consulta adicional
+        items = load_quotation_items(db, quotation_rows(rows))
+    
+    return QuotationPageRows(
+        items=items,
+        limit=limit,
+        has_more=has_more,
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/page", response_model=QuotationPage, response_class=FastJSONResponse)
+async def get_user_quotations_page(
+    summary: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_principal),
+    db: Session = Depends(get_session)
+):
+    """Obtener el historial de cotizaciones del usuario actual paginado por cursor
+    
+    Ordenado de la más reciente a la más antigua. Para la siguiente página se
+    envía el `next_cursor` de la respuesta en `after`. Con `summary=true` solo se
+    devuelven encabezados y totales, sin items.
+    """
+    return FastJSONResponse(await run_db(db, read_quotations_page, current_user.id, summary, limit, after))
+
+
+def build_pdf_job(quotation: Quotation, user: User) -> QuotationPdfJob:
+    """Preparar el PDF de una cotización: nombre, clave de caché y datos para el renderizado
+    
+    Los datos se envían al pool de procesos, así que se convierten a esquemas
+    en lugar de pasar objetos ORM. La clave incluye todo lo que el PDF imprime.
+    """
+    user_for_pdf = UserResponse.model_validate(user)
+    items_for_pdf = [QuotationItemResponse.model_validate(item) for item in quotation.items]
+    
+    key = pdf_cache_key(
+        quotation.id,
+        quotation.quotation_number,
+        quotation.created_at,
+        quotation.total_amount,
+        user_for_pdf.first_name,
+        user_for_pdf.last_name,
+        user_for_pdf.email,
+        user_for_pdf.address,
+        user_for_pdf.phone
+    )
+    return QuotationPdfJob(
+        f"cotizacion_{quotation.quotation_number}.pdf",
+        key,
+        quotation.quotation_number,
+        user_for_pdf,
+        items_for_pdf,
+        quotation.total_amount,
+        quotation.created_at
+    )
+
+
+def read_quotations_for_export(
+    db: Session,
+    user_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime]
+) -> List[QuotationPdfJob]:
+    """Leer las cotizaciones a exportar con sus items y usuarios y preparar sus PDFs"""
+    query = db.query(Quotation).options(selectinload(Quotation.items), joinedload(Quotation.user))
+    if user_id is not None:
+        query = query.filter(Quotation.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(Quotation.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Quotation.created_at < date_to)
+    
+    total = query.count()
+    if total > settings.PDF_EXPORT_MAX_QUOTATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La exportación incluye {total} cotizaciones; el máximo es "
+                   f"{settings.PDF_EXPORT_MAX_QUOTATIONS}. Acota el rango de fechas"
+        )
+    
+    quotations = query.order_by(Quotation.created_at, Quotation.id).all()
+    return [build_pdf_job(quotation, quotation.user) for quotation in quotations]
+
 
+@router.get("/export")
+async def export_quotations_zip(
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    concurrency: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_session),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Exportar los PDFs de varias cotizaciones en un ZIP (solo administradores)
+    
+    Filtra por cliente (`user_id`) y/o rango de fechas (`date_from` incluido,
+    `date_to` excluido). Los PDFs se generan en paralelo y cada uno se envía en
+    cuanto está listo. El progreso se consulta en `/quotations/export/{export_id}`
+    con el id del header `X-Export-Id`.
+    """
+    jobs = await run_db(db, read_quotations_for_export, user_id, date_from, date_to)
+    
+    # El tope global de procesos es PDF_RENDER_WORKERS; este limita lo que una exportación encola
+    limit = min(concurrency or settings.PDF_EXPORT_CONCURRENCY, settings.PDF_EXPORT_CONCURRENCY)
+    progress = start_export(len(jobs))
+    filename = f"cotizaciones_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
+    
+    return StreamingResponse(
+        stream_quotations_zip(progress, jobs, limit),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Export-Id": progress["export_id"],
+            "X-Export-Total": str(len(jobs))
+        }
+    )
 
-@router.get("/{quotation_id}", response_model=QuotationResponse)
+
+@router.get("/export/{export_id}", response_model=QuotationExportProgress)
+def get_quotation_export_progress(
+    export_id: str,
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Consultar el progreso de una exportación ZIP (solo administradores)"""
+    progress = get_export_progress(export_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exportación no encontrada"
+        )
+    return progress
+
+
+@router.get("/{quotation_id}", response_model=QuotationResponse, response_class=FastJSONResponse)
 def get_quotation(
     quotation_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserPrincipal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Obtener una cotización específica"""
-    quotation = db.query(Quotation).filter(
+    quotations = quotation_rows(db.query(*QUOTATION_ROW_COLUMNS).filter(
         Quotation.id == quotation_id,
         Quotation.user_id == current_user.id
-    ).first()
+    ))
     
-    if not quotation:
+    if not quotations:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cotización no encontrada"
         )
     
-    items_response = [
-        QuotationItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            product_name=item.product_name,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            subtotal=item.subtotal
-        )
-        for item in quotation.items
-    ]
-    
-    return QuotationResponse(
-        id=quotation.id,
-        quotation_number=quotation.quotation_number,
-        user_id=quotation.user_id,
-        total_amount=quotation.total_amount,
-        items=items_response,
-        created_at=quotation.created_at
-    )
+    return FastJSONResponse(load_quotation_items(db, quotations)[0])
+
+
+def read_quotation_for_pdf(db: Session, quotation_id: int, user_id: int) -> Optional[Quotation]:
+    """Leer la cotización del usuario con sus items"""
+    return db.query(Quotation).options(selectinload(Quotation.items)).filter(
+        Quotation.id == quotation_id,
+        Quotation.user_id == user_id
+    ).first()
 
 
 @router.get("/{quotation_id}/pdf")
-def download_quotation_pdf(
+async def download_quotation_pdf(
     quotation_id: int,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    """Descargar cotización en formato PDF"""
-    quotation = db.query(Quotation).filter(
-        Quotation.id == quotation_id,
-        Quotation.user_id == current_user.id
-    ).first()
+    """Descargar cotización en formato PDF
+    
+    El PDF se guarda en la caché de disco con una clave calculada a partir de
+    todo lo que imprime; esa clave es también el ETag, así que un cliente que
+    ya lo tiene recibe 304 sin que se lea ni se genere el PDF.
+    """
+    quotation = await run_db(db, read_quotation_for_pdf, quotation_id, current_user.id)
     
     if not quotation:
         raise HTTPException(
@@ -185,36 +414,20 @@ def download_quotation_pdf(
             detail="Cotización no encontrada"
         )
     
-    # Preparar items para PDF
-    items_for_pdf = [
-        QuotationItemResponse(
-            id=item.id,
-            product_id=item.product_id,
-            product_name=item.product_name,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            subtotal=item.subtotal
-        )
-        for item in quotation.items
-    ]
+    job = build_pdf_job(quotation, current_user)
+    etag = f'"{job.key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=cotizacion_{quotation.quotation_number}.pdf"
+    }
     
-    # Generar PDF
-    pdf_buffer = io.BytesIO()
-    generate_quotation_pdf(
-        quotation_number=quotation.quotation_number,
-        user=current_user,
-        items=items_for_pdf,
-        total_amount=quotation.total_amount,
-        output_buffer=pdf_buffer
-    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
     
-    pdf_buffer.seek(0)
+    # Abrir de la caché o generar en el pool de procesos de PDFs, que escribe directo a disco
+    pdf_file = await open_quotation_pdf(job.key, *job.render_args)
+    headers["Content-Length"] = str(os.fstat(pdf_file.fileno()).st_size)
     
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=cotizacion_{quotation.quotation_number}.pdf"
-        }
-    )
-
+    # Se envía en bloques desde el archivo abierto: la memoria no crece con el tamaño del PDF
+    return StreamingResponse(iter_pdf_file(pdf_file), media_type="application/pdf", headers=headers)
@@ -0,0 +1,221 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, func, or_, select, union
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta, timezone
+from app.database import get_db
+from app.models.cart import Cart, CartItem
+from app.models.category import Category
+from app.models.product import Product
+from app.models.report import ReportDailyProduct, ReportDaily, ReportDailyCustomer
+from app.schemas.report import (
+    ProductRevenue, CategoryRevenue, DailyRevenue, BasketStats, CartConversion, ReportRefreshResult
+)
+from app.api.deps import get_current_admin
+from app.core.principal import UserPrincipal
+from app.core.reports import refresh_reports
+
+router = APIRouter(prefix="/reports", tags=["reportes"])
+
+# Rango por defecto: los últimos 30 días, incluido hoy
+DEFAULT_REPORT_DAYS = 30
+
+
+def report_range(date_from: Optional[date], date_to: Optional[date]) -> Tuple[date, date]:
+    """Rango de días del reporte: `date_from` incluido, `date_to` excluido"""
+    if date_to is None:
+        date_to = date.today() + timedelta(days=1)
+    if date_from is None:
+        date_from = date_to - timedelta(days=DEFAULT_REPORT_DAYS)
+    if date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from debe ser anterior a date_to"
+        )
+    return date_from, date_to
+
+
+def ratio(numerator, denominator, places: str = "0.01") -> Decimal:
+    """División redondeada, 0 si no hay denominador"""
+    if not denominator:
+        return Decimal(places) * 0
+    return (Decimal(numerator) / Decimal(denominator)).quantize(Decimal(places))
+
+
+@router.get("/products", response_model=List[ProductRevenue])
+def get_product_revenue(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Productos con más monto cotizado en el rango (solo administradores)"""
+    date_from, date_to = report_range(date_from, date_to)
+    totals = (
+        db.query(
+            ReportDailyProduct.product_id,
+            func.sum(ReportDailyProduct.quotation_count).label("quotation_count"),
+            func.sum(ReportDailyProduct.quantity).label("quantity"),
+            func.sum(ReportDailyProduct.revenue).label("revenue")
+        )
+        .filter(ReportDailyProduct.day >= date_from, ReportDailyProduct.day < date_to)
+        .group_by(ReportDailyProduct.product_id)
+        .order_by(func.sum(ReportDailyProduct.revenue).desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = (
+        db.query(totals, Product.name, Product.category_id)
+        .outerjoin(Product, Product.id == totals.c.product_id)
+        .order_by(totals.c.revenue.desc())
+        .all()
+    )
+    return [
+        ProductRevenue(
+            product_id=row.product_id,
+            product_name=row.name,
+            category_id=row.category_id,
+            quotation_count=row.quotation_count,
+            quantity=row.quantity,
+            revenue=row.revenue
+        )
+        for row in rows
+    ]
+
+
+@router.get("/categories", response_model=List[CategoryRevenue])
+def get_category_revenue(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Monto cotizado por categoría en el rango (solo administradores)"""
+    date_from, date_to = report_range(date_from, date_to)
+    totals = (
+        db.query(
+            ReportDailyProduct.category_id,
+            # Un producto aparece una vez por cotización: la suma son líneas, no cotizaciones distintas
+            func.sum(ReportDailyProduct.quotation_count).label("line_count"),
+            func.sum(ReportDailyProduct.quantity).label("quantity"),
+            func.sum(ReportDailyProduct.revenue).label("revenue")
+        )
+        .filter(ReportDailyProduct.day >= date_from, ReportDailyProduct.day < date_to)
+        .group_by(ReportDailyProduct.category_id)
+        .subquery()
+    )
+    rows = (
+        db.query(totals, Category.name)
+        .outerjoin(Category, Category.id == totals.c.category_id)
+        .order_by(totals.c.revenue.desc())
+        .all()
+    )
+    return [
+        CategoryRevenue(
+            category_id=row.category_id,
+            category_name=row.name,
+            line_count=row.line_count,
+            quantity=row.quantity,
+            revenue=row.revenue
+        )
+        for row in rows
+    ]
+
+
+@router.get("/daily", response_model=List[DailyRevenue])
+def get_daily_revenue(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Cotizaciones y monto cotizado por día (solo administradores)"""
+    date_from, date_to = report_range(date_from, date_to)
+    return db.query(ReportDaily).filter(
+        ReportDaily.day >= date_from,
+        ReportDaily.day < date_to
+    ).order_by(ReportDaily.day).all()
+
+
+@router.get("/basket", response_model=BasketStats)
+def get_basket_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Tamaño promedio de las cotizaciones en el rango (solo administradores)"""
+    date_from, date_to = report_range(date_from, date_to)
+    quotation_count, line_count, units, revenue = db.query(
+        func.coalesce(func.sum(ReportDaily.quotation_count), 0),
+        func.coalesce(func.sum(ReportDaily.line_count), 0),
+        func.coalesce(func.sum(ReportDaily.units), 0),
+        func.coalesce(func.sum(ReportDaily.revenue), 0)
+    ).filter(ReportDaily.day >= date_from, ReportDaily.day < date_to).one()
+    
+    return BasketStats(
+        quotation_count=quotation_count,
+        revenue=revenue,
+        average_total=ratio(revenue, quotation_count),
+        average_lines=ratio(line_count, quotation_count),
+        average_units=ratio(units, quotation_count)
+    )
+
+
+@router.get("/conversion", response_model=CartConversion)
+def get_cart_conversion(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Conversión de carrito a cotización en el rango (solo administradores)
+    
+    Clientes activos: agregaron o cambiaron productos del carrito en el rango, o
+    cotizaron (al cotizar con `clear_cart` el carrito queda vacío). La tasa es
+    la fracción de clientes activos que crearon al menos una cotización.
+    """
+    date_from, date_to = report_range(date_from, date_to)
+    start = datetime.combine(date_from, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(date_to, time.min, tzinfo=timezone.utc)
+    
+    cart_customers = (
+        select(Cart.user_id)
+        .join(CartItem, CartItem.cart_id == Cart.id)
+        .where(or_(
+            and_(CartItem.created_at >= start, CartItem.created_at < end),
+            and_(CartItem.updated_at >= start, CartItem.updated_at < end)
+        ))
+    )
+    quoting_customers = select(ReportDailyCustomer.user_id).where(
+        ReportDailyCustomer.day >= date_from,
+        ReportDailyCustomer.day < date_to
+    )
+    
+    active_count = db.scalar(
+        select(func.count()).select_from(union(cart_customers, quoting_customers).subquery())
+    )
+    quoting_count = db.scalar(
+        select(func.count(func.distinct(ReportDailyCustomer.user_id))).where(
+            ReportDailyCustomer.day >= date_from,
+            ReportDailyCustomer.day < date_to
+        )
+    )
+    
+    return CartConversion(
+        active_customers=active_count,
+        quoting_customers=quoting_count,
+        conversion_rate=ratio(quoting_count, active_count, "0.0001")
+    )
+
+
+@router.post("/refresh", response_model=ReportRefreshResult)
+def refresh_report_tables(
+    full: bool = False,
+    db: Session = Depends(get_db),
+    admin: UserPrincipal = Depends(get_current_admin)
+):
+    """Agregar ya las cotizaciones pendientes; con `full=true` recalcular todo (solo administradores)"""
+    return refresh_reports(db, full=full)
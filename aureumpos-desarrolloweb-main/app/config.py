@@ -5,11 +5,51 @@ from typing import List
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql://aureumpos_user:aureumpos_password@db:5432/aureumpos_db"
+    # Modo asíncrono: las rutas de carrito y catálogo usan AsyncSession (asyncpg / aiosqlite)
+    DATABASE_ASYNC: bool = False
+    
+    # Pool de conexiones (por proceso: multiplicar por los workers de gunicorn
+    # y comparar con max_connections de PostgreSQL)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # segundos; -1 desactiva el reciclaje
+    DB_POOL_TIMEOUT: int = 30  # segundos esperando una conexión libre
+    DB_POOL_PRE_PING: bool = True  # un ping por checkout; con DB_POOL_RECYCLE suele bastar
+    
+    # Métricas de peticiones (GET /metrics) y logs de lentitud; 0 desactiva cada log
+    SLOW_QUERY_MS: int = 200  # sentencias SQL más lentas se registran con su ruta
+    SLOW_REQUEST_MS: int = 1000  # peticiones más lentas se registran con su sentencia más lenta
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-this-in-production-min-32-characters"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Caché por proceso de usuarios autenticados (las rutas de administración confirman el rol aquí)
+    AUTH_PRINCIPAL_CACHE_TTL: int = 30  # segundos que otro worker puede aceptar un rol de admin retirado
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    
+    # Contraseñas (bcrypt)
+    BCRYPT_ROUNDS: int = 12  # al cambiarlo, los hashes se regeneran en el siguiente login
+    PASSWORD_HASH_WORKERS: int = 2  # procesos dedicados; 0 usa el threadpool
+    PASSWORD_HASH_MAX_PENDING: int = 32  # por encima responde 429
+    
+    # PDFs de cotizaciones
+    PDF_CACHE_DIR: str = "/tmp/aureumpos/pdf"  # compartido por los workers del mismo host
+    PDF_CACHE_MAX_MB: int = 256  # al superarlo se borran los PDFs usados hace más tiempo
+    PDF_RENDER_WORKERS: int = 2  # procesos dedicados; 0 usa el threadpool
+    PDF_EXPORT_CONCURRENCY: int = 4  # PDFs en proceso a la vez por cada exportación ZIP
+    PDF_EXPORT_MAX_QUOTATIONS: int = 5000  # máximo de cotizaciones por exportación
+    
+    # Reportes de administración (tablas de resumen)
+    REPORTS_REFRESH_SECONDS: int = 300  # cada cuánto se agregan las cotizaciones nuevas; 0 desactiva
+    REPORTS_REFRESH_LAG_SECONDS: int = 60  # no agregar cotizaciones más recientes (transacciones en curso)
+    REPORTS_REFRESH_BATCH: int = 50000  # cotizaciones por transacción de actualización
+    
+    # Caché de respuestas del catálogo público (productos y categorías)
+    CATALOG_CACHE_TTL: int = 30  # segundos que otro worker puede servir el catálogo viejo; 0 desactiva
+    CATALOG_CACHE_SIZE: int = 1000  # respuestas guardadas por worker
+    CATALOG_CACHE_REDIS_URL: str = ""  # p. ej. redis://localhost:6379/0 para compartir la caché entre workers
     
     # Admin
     ADMIN_EMAIL: str = "admin@aureumpos.com"
@@ -18,6 +58,19 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:8080,http://127.0.0.1:5500"
     
+    @property
+    def async_database_url(self) -> str:
+        """DATABASE_URL con el driver asíncrono correspondiente"""
+        url = self.DATABASE_URL
+        for prefix, async_prefix in (
+            ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+            ("postgresql://", "postgresql+asyncpg://"),
+            ("sqlite://", "sqlite+aiosqlite://"),
+        ):
+            if url.startswith(prefix):
+                return async_prefix + url[len(prefix):]
+        return url
+    
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
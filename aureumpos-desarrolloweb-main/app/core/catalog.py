@@ -0,0 +1,198 @@
+import gzip
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from fastapi import BackgroundTasks
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, dialect_insert
+from app.models.category import Category
+from app.models.catalog import CatalogState, CatalogDeletedProduct
+from app.models.product import Product
+from app.core.read_models import (
+    CATEGORY_ROW_COLUMNS, PRODUCT_ROW_COLUMNS, CategoryRow, ProductRow, product_rows, query_category_rows, category_rows
+)
+from app.core.response_cache import catalog_cache
+from app.core.serialization import dump_json
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él se sirve gzip
+    brotli = None
+
+CATALOG_STATE_NAME = "catalog"
+CATALOG_GZIP_LEVEL = 6
+CATALOG_BROTLI_QUALITY = 9
+
+
+def read_catalog_version(db: Session) -> int:
+    """Versión actual del catálogo (0 antes del primer cambio de un admin)"""
+    version = db.execute(
+        select(CatalogState.version).where(CatalogState.name == CATALOG_STATE_NAME)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version(db: Session) -> int:
+    """Tomar la siguiente versión del catálogo dentro de la transacción en curso
+    
+    Se llama justo antes de confirmar un cambio de productos o categorías. En
+    PostgreSQL el upsert bloquea la fila de estado hasta el commit, así las versiones
+    se toman en el mismo orden en que los cambios se hacen visibles.
+    """
+    stmt = dialect_insert(db, CatalogState).values(name=CATALOG_STATE_NAME, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogState.name],
+        set_={"version": CatalogState.version + 1, "updated_at": func.now()}
+    )
+    return db.execute(stmt.returning(CatalogState.version)).scalar_one()
+
+
+def record_deleted_product(db: Session, product_id: int, version: int) -> None:
+    """Dejar registro de un producto borrado para los clientes que piden deltas"""
+    stmt = dialect_insert(db, CatalogDeletedProduct).values(product_id=product_id, version=version)
+    db.execute(stmt.on_conflict_do_update(index_elements=[CatalogDeletedProduct.product_id], set_={"version": version}))
+
+
+@dataclass(slots=True)
+class CatalogRows:
+    """CatalogSnapshot con modelos de lectura"""
+    version: int
+    products: List[ProductRow]
+    categories: List[CategoryRow]
+
+
+@dataclass(slots=True)
+class CatalogDeltaRows:
+    """CatalogDelta con modelos de lectura"""
+    version: int
+    since: int
+    products: List[ProductRow]
+    deleted_product_ids: List[int]
+    categories: List[CategoryRow]
+
+
+def build_catalog_snapshot(db: Session) -> CatalogRows:
+    """Leer el catálogo completo: una lectura de productos y otra de categorías"""
+    # La versión se lee antes que los datos: un cambio confirmado entre ambas lecturas
+    # aparece también en el próximo delta, nunca se pierde
+    version = read_catalog_version(db)
+    products = product_rows(db.query(*PRODUCT_ROW_COLUMNS).order_by(Product.id))
+    # Los conteos por categoría salen de los mismos productos, sin consulta agrupada
+    product_counts = Counter(product.category_id for product in products)
+    categories = [
+        CategoryRow(*row, product_counts.get(row.id, 0))
+        for row in db.query(*CATEGORY_ROW_COLUMNS).order_by(Category.id)
+    ]
+    return CatalogRows(version=version, products=products, categories=categories)
+
+
+def build_catalog_delta(db: Session, since: int) -> Optional[CatalogDeltaRows]:
+    """Productos modificados o borrados después de la versión `since`, o None si `since` no existe"""
+    version = read_catalog_version(db)
+    if since > version:
+        return None
+    products = product_rows(
+        db.query(*PRODUCT_ROW_COLUMNS).filter(Product.catalog_version > since).order_by(Product.id)
+    )
+    deleted_ids = db.execute(
+        select(CatalogDeletedProduct.product_id)
+        .where(CatalogDeletedProduct.version > since)
+        .order_by(CatalogDeletedProduct.product_id)
+    ).scalars().all()
+    return CatalogDeltaRows(
+        version=version,
+        since=since,
+        products=products,
+        deleted_product_ids=list(deleted_ids),
+        categories=category_rows(query_category_rows(db).order_by(Category.id))
+    )
+
+
+def compress_body(body: bytes) -> Dict[str, bytes]:
+    """El cuerpo en cada codificación que el servidor puede enviar"""
+    # mtime=0: la misma versión produce siempre los mismos bytes en todos los workers
+    encodings = {"identity": body, "gzip": gzip.compress(body, CATALOG_GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=CATALOG_BROTLI_QUALITY)
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Elegir br, luego gzip, según el header Accept-Encoding"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    for coding in ("br", "gzip"):
+        if coding in available and (coding in accepted or "*" in accepted):
+            return coding
+    return "identity"
+
+
+@dataclass(frozen=True)
+class CatalogBlob:
+    """Snapshot del catálogo serializado y comprimido"""
+    version: int
+    encodings: Dict[str, bytes]
+
+    def etag(self, encoding: str) -> str:
+        # Un ETag fuerte distinto por codificación: los bytes enviados son distintos
+        return f'"catalog-{self.version}-{encoding}"'
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes]:
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        return encoding, self.encodings[encoding]
+
+
+class CatalogSnapshotStore:
+    """Último snapshot del catálogo de este worker, regenerado cuando sube la versión
+    
+    Cada lectura consulta la fila de versión (una búsqueda por clave primaria), así un
+    cambio hecho en otro worker se ve en la siguiente petición. Se regenera una sola
+    vez a la vez: las peticiones concurrentes esperan la que está en curso.
+    """
+
+    def __init__(self):
+        self._blob: Optional[CatalogBlob] = None
+        self._lock = threading.Lock()
+
+    def current(self, db: Session) -> CatalogBlob:
+        version = read_catalog_version(db)
+        blob = self._blob
+        if blob is not None and blob.version >= version:
+            return blob
+        with self._lock:
+            blob = self._blob
+            if blob is not None and blob.version >= version:
+                return blob
+            snapshot = build_catalog_snapshot(db)
+            blob = CatalogBlob(version=snapshot.version, encodings=compress_body(dump_json(snapshot)))
+            self._blob = blob
+            return blob
+
+
+catalog_snapshot = CatalogSnapshotStore()
+
+
+def refresh_catalog_snapshot() -> None:
+    """Regenerar el snapshot después del cambio de un admin (tarea en segundo plano)"""
+    db = SessionLocal()
+    try:
+        catalog_snapshot.current(db)
+    finally:
+        db.close()
+
+
+def catalog_changed(background_tasks: BackgroundTasks) -> None:
+    """Tras confirmar un cambio del catálogo: descartar las respuestas en caché y regenerar el snapshot"""
+    catalog_cache.invalidate()
+    background_tasks.add_task(refresh_catalog_snapshot)
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+from typing import IO, Any, Dict, Iterable, Iterator, Tuple
+from app.schemas.product import ProductCreate
+
+# Columnas del archivo de importación/exportación de productos
+EXPORT_COLUMNS = ["id", "name", "price", "image_url", "category_id", "created_at", "updated_at"]
+
+
+class ImportRowError(ValueError):
+    """Error en una fila del archivo de importación de productos"""
+
+
+def read_import_rows(file: IO[bytes], file_format: str) -> Iterator[Tuple[int, Any]]:
+    """Recorrer las filas (número de línea, fila) de un CSV o NDJSON sin cargar el archivo completo"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, ImportRowError(f"JSON inválido: {e}")
+
+
+def parse_import_row(row: Any, category_ids: set, category_names: Dict[str, int]) -> Dict[str, Any]:
+    """Validar una fila importada con ProductCreate y devolver los valores a insertar
+    
+    La categoría puede venir como `category_id` o como `category_name`.
+    """
+    if isinstance(row, ImportRowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ImportRowError("La fila debe ser un objeto")
+
+    # En CSV las celdas vacías llegan como "", se tratan como ausentes
+    data = {key: value for key, value in row.items() if key and value not in ("", None)}
+
+    category_name = data.pop("category_name", None)
+    if "category_id" not in data and category_name is not None:
+        category_id = category_names.get(str(category_name).strip().lower())
+        if category_id is None:
+            raise ImportRowError(f"Categoría no encontrada: {category_name}")
+        data["category_id"] = category_id
+
+    product = ProductCreate.model_validate(data)
+    if product.category_id not in category_ids:
+        raise ImportRowError(f"Categoría no encontrada: {product.category_id}")
+    return product.model_dump()
+
+
+def format_export_rows(rows: Iterable[Tuple], file_format: str, header: bool) -> str:
+    """Escribir un lote de productos como texto CSV o NDJSON"""
+    buffer = io.StringIO()
+    if file_format == "csv":
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_COLUMNS)
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str, ensure_ascii=False))
+            buffer.write("\n")
+    return buffer.getvalue()
@@ -0,0 +1,410 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Sentencias SQL por petición: un N+1 se ve como peticiones en los buckets altos
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Tamaño (bytes) del cuerpo de las respuestas
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Largo máximo de una sentencia SQL en el log de consultas lentas
+SLOW_LOG_STATEMENT_CHARS = 2000
+# Formato de texto de Prometheus
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Histograma de buckets acumulados, seguro entre hilos"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "max": self.max,
+                "avg": self.sum / self.count if self.count else 0.0,
+                "buckets": dict(zip(self.buckets, self.counts)),
+            }
+
+
+class PoolMetrics:
+    """Contadores del pool de conexiones, alimentados por los eventos del pool y los pools instrumentados"""
+
+    def __init__(self):
+        self.checkout_time = Histogram()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.max_overflow_in_use = 0
+        self._lock = threading.Lock()
+        self._pools: List[Pool] = []
+
+    def track(self, pool: Pool) -> None:
+        """Escuchar los eventos de un pool e informar su tamaño"""
+        self._pools.append(pool)
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+            for pool in self._pools:
+                if isinstance(pool, QueuePool):
+                    self.max_overflow_in_use = max(self.max_overflow_in_use, pool.overflow())
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def record_checkout_wait(self, seconds: float, timed_out: bool) -> None:
+        self.checkout_time.observe(seconds)
+        if timed_out:
+            with self._lock:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict:
+        pools = []
+        for pool in self._pools:
+            status = {"class": type(pool).__name__}
+            if isinstance(pool, QueuePool):
+                status.update({
+                    "size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": pool.overflow(),
+                    "max_overflow": pool._max_overflow,
+                    "timeout": pool.timeout(),
+                })
+            pools.append(status)
+        with self._lock:
+            counters = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "max_overflow_in_use": self.max_overflow_in_use,
+            }
+        return {
+            "pools": pools,
+            **counters,
+            "checkout_time_seconds": self.checkout_time.snapshot(),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+def _timed_do_get(do_get, pool: Pool):
+    """Medir cuánto espera un checkout por una conexión libre (o nueva)"""
+    start = time.perf_counter()
+    timed_out = False
+    try:
+        return do_get(pool)
+    except PoolTimeoutError:
+        timed_out = True
+        raise
+    finally:
+        pool_metrics.record_checkout_wait(time.perf_counter() - start, timed_out)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que registra la espera de cada checkout"""
+
+    def _do_get(self):
+        return _timed_do_get(QueuePool._do_get, self)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool que registra la espera de cada checkout"""
+
+    def _do_get(self):
+        return _timed_do_get(AsyncAdaptedQueuePool._do_get, self)
+
+
+# Peticiones que no coincidieron con ninguna ruta (404, preflight de CORS): una sola serie
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """Actividad SQL de la petición en curso, accesible desde una variable de contexto
+    
+    Las rutas síncronas corren en el threadpool y las sesiones asíncronas en greenlets;
+    ambos heredan el contexto de la petición, así cada sentencia se cuenta donde corresponde.
+    """
+
+    __slots__ = ("scope", "method", "route", "statements", "db_time", "slowest_time", "slowest_statement", "active")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        # Se resuelve al terminar, cuando el router ya eligió el endpoint
+        self.route = UNMATCHED_ROUTE
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+        # Al terminar la respuesta deja de contar (p. ej. las background tasks)
+        self.active = True
+
+
+class RouteMetrics:
+    """Histogramas de un par (método, ruta)"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram()
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("aureumpos_request_stats", default=None)
+
+
+class RequestMetrics:
+    """Latencia, sentencias SQL, tiempo en la base de datos y tamaño de respuesta por ruta, y los logs de lentitud"""
+
+    def __init__(self):
+        self.statement_time = Histogram()
+        self.slow_queries = 0
+        self.slow_requests = 0
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._route_paths: Dict = {}
+        self._lock = threading.Lock()
+
+    def track(self, engine: Engine) -> None:
+        """Medir cada sentencia que ejecuta el motor"""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        self.statement_time.observe(elapsed)
+        stats = _current_request.get()
+        if stats is not None and stats.active:
+            stats.statements += 1
+            stats.db_time += elapsed
+            if elapsed >= stats.slowest_time:
+                stats.slowest_time = elapsed
+                stats.slowest_statement = statement
+        if settings.SLOW_QUERY_MS > 0 and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            with self._lock:
+                self.slow_queries += 1
+            logger.warning(
+                "Consulta lenta (%.1f ms) en %s: %s",
+                elapsed * 1000,
+                f"{stats.method} {self.route_of(stats.scope)}" if stats is not None else "-",
+                statement[:SLOW_LOG_STATEMENT_CHARS]
+            )
+
+    def _handle_error(self, exception_context) -> None:
+        # Una sentencia que falla no llega a after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+    def start_request(self, scope) -> RequestStats:
+        stats = RequestStats(scope)
+        _current_request.set(stats)
+        return stats
+
+    def route_of(self, scope) -> str:
+        """Plantilla de la ruta que atendió la petición, p. ej. /products/{product_id}"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            # Starlette no deja la ruta en el scope, solo el endpoint: se busca una vez por endpoint
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = UNMATCHED_ROUTE
+            self._route_paths[endpoint] = path
+        return path
+
+    def finish_request(self, stats: RequestStats, status_code: int, elapsed: float, size: int) -> None:
+        stats.active = False
+        stats.route = self.route_of(stats.scope)
+        with self._lock:
+            route = self._routes.get((stats.method, stats.route))
+            if route is None:
+                route = self._routes[(stats.method, stats.route)] = RouteMetrics()
+            route.statuses[status_code] = route.statuses.get(status_code, 0) + 1
+        route.latency.observe(elapsed)
+        route.statements.observe(stats.statements)
+        route.db_time.observe(stats.db_time)
+        route.response_size.observe(size)
+        if settings.SLOW_REQUEST_MS > 0 and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            with self._lock:
+                self.slow_requests += 1
+            logger.warning(
+                "Petición lenta (%.1f ms): %s %s -> %d, %d sentencias SQL en %.1f ms, %d bytes; "
+                "la más lenta (%.1f ms): %s",
+                elapsed * 1000, stats.method, stats.route, status_code, stats.statements,
+                stats.db_time * 1000, size, stats.slowest_time * 1000,
+                (stats.slowest_statement or "-")[:SLOW_LOG_STATEMENT_CHARS]
+            )
+
+    def routes(self) -> List[Tuple[Tuple[str, str], RouteMetrics]]:
+        with self._lock:
+            return sorted(self._routes.items())
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI que alimenta request_metrics
+    
+    La petición se mide hasta enviar el último byte del cuerpo; las background tasks
+    que corren después no se cuentan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = request_metrics.start_request(scope)
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        def finish() -> None:
+            request_metrics.finish_request(stats, status_code, time.perf_counter() - start, size)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if stats.active:
+                # Excepción sin respuesta, o cliente desconectado a mitad del envío
+                finish()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items())
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str = "") -> List[str]:
+    snapshot = histogram.snapshot()
+    prefix = f"{labels}," if labels else ""
+    lines = [f'{name}_bucket{{{prefix}le="{bound}"}} {count}' for bound, count in snapshot["buckets"].items()]
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {snapshot["count"]}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+    return lines
+
+
+def _family(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_prometheus() -> str:
+    """Métricas de peticiones, SQL y pool de este worker en formato de texto de Prometheus"""
+    lines: List[str] = []
+    routes = request_metrics.routes()
+
+    _family(lines, "aureumpos_http_requests_total", "counter", "HTTP requests by route and status code")
+    for (method, route), metrics in routes:
+        for status_code, count in sorted(metrics.statuses.items()):
+            lines.append(
+                f"aureumpos_http_requests_total{{{_labels(method=method, route=route, status=status_code)}}} {count}"
+            )
+
+    for name, attribute, help_text in (
+        ("aureumpos_http_request_duration_seconds", "latency", "Request latency until the last body byte"),
+        ("aureumpos_http_request_db_statements", "statements", "SQL statements executed per request"),
+        ("aureumpos_http_request_db_seconds", "db_time", "Time spent executing SQL per request"),
+        ("aureumpos_http_response_size_bytes", "response_size", "Response body size"),
+    ):
+        _family(lines, name, "histogram", help_text)
+        for (method, route), metrics in routes:
+            lines.extend(_histogram_lines(name, getattr(metrics, attribute), _labels(method=method, route=route)))
+
+    _family(lines, "aureumpos_db_statement_duration_seconds", "histogram", "Duration of each SQL statement")
+    lines.extend(_histogram_lines("aureumpos_db_statement_duration_seconds", request_metrics.statement_time))
+    _family(lines, "aureumpos_db_slow_statements_total", "counter", "Statements slower than SLOW_QUERY_MS")
+    lines.append(f"aureumpos_db_slow_statements_total {request_metrics.slow_queries}")
+    _family(lines, "aureumpos_http_slow_requests_total", "counter", "Requests slower than SLOW_REQUEST_MS")
+    lines.append(f"aureumpos_http_slow_requests_total {request_metrics.slow_requests}")
+
+    pool = pool_metrics.snapshot()
+    for key in ("connects", "checkouts", "checkins", "invalidations", "timeouts"):
+        name = f"aureumpos_db_pool_{key}_total"
+        _family(lines, name, "counter", f"Connection pool {key}")
+        lines.append(f"{name} {pool[key]}")
+    for key in ("size", "checked_in", "checked_out", "overflow"):
+        name = f"aureumpos_db_pool_{key}"
+        _family(lines, name, "gauge", f"Connection pool {key.replace('_', ' ')}")
+        for index, status in enumerate(pool["pools"]):
+            if key in status:
+                lines.append(f"{name}{{{_labels(pool=index, pool_class=status['class'])}}} {status[key]}")
+    _family(lines, "aureumpos_db_pool_checkout_wait_seconds", "histogram", "Wait for a pooled connection")
+    lines.extend(_histogram_lines("aureumpos_db_pool_checkout_wait_seconds", pool_metrics.checkout_time))
+    return "\n".join(lines) + "\n"
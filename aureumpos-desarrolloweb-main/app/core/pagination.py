@@ -0,0 +1,27 @@
+import base64
+import json
+from typing import Any, List, Optional
+from fastapi import HTTPException, status
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Codificar los valores keyset de la última fila en un cursor opaco"""
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Decodificar un cursor opaco a sus valores keyset"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+    return values
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.core.pdf_generator import PDF_TEMPLATE_VERSION, write_quotation_pdf
+
+# Tamaño de los bloques con que se envía un PDF
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def pdf_cache_key(*parts) -> str:
+    """Clave de contenido de un PDF: versión de la plantilla y todo lo que se imprime en él"""
+    digest = hashlib.sha256(PDF_TEMPLATE_VERSION.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\x1f")
+        digest.update(str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Al superar el límite se desaloja hasta esta fracción, así el directorio no se recorre en cada PDF nuevo
+PDF_CACHE_EVICT_TO = 0.9
+
+
+class PdfDiskCache:
+    """Directorio de PDFs generados con tamaño máximo y desalojo LRU, compartido por los workers
+    
+    Las escrituras son atómicas (archivo temporal + rename), cada lectura renueva el
+    mtime y un archivo borrado por otro proceso cuenta como fallo de caché.
+    Cada worker lleva en memoria el tamaño total (contado una vez al empezar y
+    actualizado con sus propios PDFs) y solo recorre el directorio cuando esa cuenta
+    supera el límite; los PDFs de otros workers se suman en ese recorrido.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[str, int]] = None  # tamaño por ruta, None hasta el primer recorrido
+        self._total = 0
+        self._evicting = False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """Abrir un PDF de la caché para leerlo, o None si no está
+        
+        El archivo abierto se puede seguir leyendo aunque otro worker lo desaloje.
+        """
+        path = self._path(key)
+        try:
+            pdf_file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # marcar como usado recientemente
+        except FileNotFoundError:
+            pass
+        return pdf_file
+
+    def temp_path(self) -> str:
+        """Crear un archivo temporal vacío en el directorio de caché para un renderizado en curso"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+
+    def commit(self, key: str, tmp_path: str) -> BinaryIO:
+        """Publicar el archivo temporal con su clave, desalojar PDFs viejos y devolverlo abierto"""
+        path = self._path(key)
+        # Renombrar dentro del mismo directorio es atómico: nadie lee un PDF a medias
+        os.replace(tmp_path, path)
+        # Abrir antes de desalojar: un PDF más grande que el límite se sirve igual
+        pdf_file = open(path, "rb")
+        size = os.fstat(pdf_file.fileno()).st_size
+        
+        with self._lock:
+            if self._sizes is not None:
+                self._total += size - self._sizes.get(path, 0)
+                self._sizes[path] = size
+            # Primer PDF del proceso (todavía sin cuenta) o cuenta sobre el límite: recorrer el directorio
+            must_scan = (self._sizes is None or self._total > self.max_bytes) and not self._evicting
+            if must_scan:
+                self._evicting = True
+        if must_scan:
+            self.evict()
+        return pdf_file
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> None:
+        """Recorrer el directorio y, si supera max_bytes, borrar los PDFs usados hace más tiempo
+        
+        Se desaloja hasta PDF_CACHE_EVICT_TO del límite. El recorrido no toma el lock:
+        los demás renderizados siguen publicando mientras tanto.
+        """
+        try:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * PDF_CACHE_EVICT_TO
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    evicted += 1
+                entries = entries[evicted:]
+            # Un PDF publicado durante el recorrido puede quedar fuera de la cuenta hasta el siguiente
+            with self._lock:
+                self._sizes = {path: size for _, size, path in entries}
+                self._total = total
+        finally:
+            with self._lock:
+                self._evicting = False
+
+
+# Las cotizaciones no cambian una vez creadas: cada PDF se guarda con su clave de contenido
+pdf_cache = PdfDiskCache(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_MB * 1024 * 1024)
+
+# Pool de procesos para ReportLab: renderizar ocupa CPU y no debe bloquear el worker
+_render_executor: Optional[ProcessPoolExecutor] = None
+_render_lock = threading.Lock()
+
+
+def _get_render_executor() -> Optional[ProcessPoolExecutor]:
+    global _render_executor
+    if settings.PDF_RENDER_WORKERS <= 0:
+        return None
+    with _render_lock:
+        if _render_executor is None:
+            # spawn: los procesos hijos no heredan las conexiones abiertas del pool de la base de datos
+            _render_executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _render_executor
+
+
+def shutdown_render_executor() -> None:
+    """Detener el pool de procesos de renderizado de PDFs"""
+    global _render_executor
+    with _render_lock:
+        if _render_executor is not None:
+            _render_executor.shutdown(wait=False, cancel_futures=True)
+            _render_executor = None
+
+
+async def render_quotation_pdf_async(path: str, *args) -> int:
+    """Renderizar el PDF de una cotización a un archivo en el pool de procesos de PDFs"""
+    executor = _get_render_executor()
+    if executor is None:
+        return await run_in_threadpool(write_quotation_pdf, path, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, write_quotation_pdf, path, *args)
+
+
+async def open_quotation_pdf(key: str, *args) -> BinaryIO:
+    """Abrir un PDF de la caché en disco, renderizándolo y guardándolo antes si no está
+    
+    El proceso de renderizado escribe el PDF directo a disco, así el worker de la
+    API nunca tiene el documento completo en memoria.
+    """
+    pdf_file = await run_in_threadpool(pdf_cache.open, key)
+    if pdf_file is None:
+        tmp_path = await run_in_threadpool(pdf_cache.temp_path)
+        try:
+            await render_quotation_pdf_async(tmp_path, *args)
+            pdf_file = await run_in_threadpool(pdf_cache.commit, key, tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return pdf_file
+
+
+def iter_pdf_file(pdf_file: BinaryIO) -> Iterator[bytes]:
+    """Enviar un PDF abierto en bloques de tamaño fijo y cerrarlo al terminar"""
+    with pdf_file:
+        while True:
+            chunk = pdf_file.read(PDF_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,136 @@
+import asyncio
+import io
+import uuid
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.core.cache import TTLCache
+from app.core.pdf_cache import PDF_STREAM_CHUNK_SIZE, open_quotation_pdf
+
+# Progreso de las exportaciones recientes (por proceso), consultable por export_id;
+# el TTL cuenta desde la última actualización
+export_progress = TTLCache(maxsize=1000, ttl=3600)
+
+
+class QuotationPdfJob:
+    """Una cotización de la exportación: nombre en el ZIP, clave de caché y datos para el renderizado"""
+
+    def __init__(self, filename: str, key: str, *render_args):
+        self.filename = filename
+        self.key = key
+        self.render_args = render_args
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Destino de solo escritura y sin seek para zipfile; se vacía después de cada archivo"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _add_pdf_to_zip(archive: zipfile.ZipFile, filename: str, pdf_file) -> None:
+    with pdf_file, archive.open(filename, "w") as entry:
+        while True:
+            chunk = pdf_file.read(PDF_STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            entry.write(chunk)
+
+
+def start_export(total: int) -> dict:
+    """Registrar una exportación nueva y devolver su progreso (con su `export_id`)"""
+    export_id = uuid.uuid4().hex
+    progress = {
+        "export_id": export_id,
+        "status": "running",
+        "total": total,
+        "done": 0,
+        "failed": 0,
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+    export_progress.set(export_id, progress)
+    return progress
+
+
+def _update_progress(progress: dict, **changes) -> None:
+    # Se vuelve a guardar para que una exportación larga no venza en la caché mientras corre
+    # (y para registrarla de nuevo si la sacó el límite de tamaño)
+    progress.update(changes)
+    export_progress.set(progress["export_id"], progress)
+
+
+def get_export_progress(export_id: str) -> Optional[dict]:
+    """Progreso de una exportación reciente, o None si no se conoce"""
+    return export_progress.get(export_id)
+
+
+async def stream_quotations_zip(
+    progress: dict,
+    jobs: List[QuotationPdfJob],
+    concurrency: int
+) -> AsyncIterator[bytes]:
+    """Renderizar los PDFs en paralelo y enviar el ZIP a medida que cada uno termina
+    
+    Hay a lo sumo `concurrency` renderizados en curso; cada PDF terminado se agrega
+    al ZIP (en orden de finalización) y sus bytes se envían enseguida. Los PDFs que
+    fallan se listan en `errores.txt` al final del archivo. `progress` es el
+    devuelto por start_export y se actualiza en el lugar.
+    """
+    buffer = _ZipStreamBuffer()
+    archive = zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED)
+    pending_jobs = iter(jobs)
+    running = {}
+    errors = []
+
+    def start_next() -> None:
+        job = next(pending_jobs, None)
+        if job is not None:
+            task = asyncio.ensure_future(open_quotation_pdf(job.key, *job.render_args))
+            running[task] = job
+
+    try:
+        for _ in range(max(concurrency, 1)):
+            start_next()
+
+        while running:
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                job = running.pop(task)
+                start_next()
+                try:
+                    pdf_file = task.result()
+                except Exception as exc:
+                    errors.append(f"{job.filename}: {exc}")
+                    _update_progress(progress, failed=progress["failed"] + 1)
+                    continue
+                await run_in_threadpool(_add_pdf_to_zip, archive, job.filename, pdf_file)
+                _update_progress(progress, done=progress["done"] + 1)
+                yield buffer.drain()
+
+        if errors:
+            archive.writestr("errores.txt", "\n".join(errors))
+        archive.close()
+        _update_progress(progress, status="done")
+        yield buffer.drain()
+    except BaseException:
+        _update_progress(progress, status="error")
+        raise
+    finally:
+        # Cliente desconectado o error: no dejar renders huérfanos
+        for task in running:
+            task.cancel()
+        _update_progress(progress, finished_at=datetime.utcnow())
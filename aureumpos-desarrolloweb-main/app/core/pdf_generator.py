@@ -6,65 +6,160 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from datetime import datetime
 from decimal import Decimal
-from typing import List
+from typing import BinaryIO, List, Optional
 from app.schemas.quotation import QuotationItemResponse
 from app.schemas.user import UserResponse
 import io
 
+# Subir cuando cambie el diseño del PDF: invalida los PDFs guardados en la caché de disco
+PDF_TEMPLATE_VERSION = "2"
+
+# Filas de productos por tabla (par, para que las filas alternas sigan el mismo patrón):
+# cada tabla ocupa como mucho una página, así ReportLab no tiene que partir una tabla
+# de miles de filas (costo cuadrático en tiempo y memoria)
+PRODUCT_ROWS_PER_TABLE = 24
+
+# Estilos: se construyen una sola vez por proceso
+_sample_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_sample_styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#1a1a1a'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_sample_styles['Heading2'],
+    fontSize=14,
+    textColor=colors.HexColor('#333333'),
+    spaceAfter=12
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_sample_styles['Normal'],
+    fontSize=10,
+    textColor=colors.HexColor('#666666')
+)
+
+TOTAL_STYLE = ParagraphStyle(
+    'TotalStyle',
+    parent=_sample_styles['Normal'],
+    fontSize=14,
+    textColor=colors.HexColor('#1a1a1a'),
+    alignment=TA_RIGHT,
+    fontName='Helvetica-Bold'
+)
+
+FOOTER_STYLE = ParagraphStyle(
+    'FooterStyle',
+    parent=_sample_styles['Normal'],
+    fontSize=9,
+    textColor=colors.HexColor('#999999'),
+    alignment=TA_CENTER
+)
+
+CLIENT_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#333333')),
+    ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#666666')),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+PRODUCT_TABLE_HEADER = ["Producto", "Cantidad", "Precio Unitario", "Subtotal"]
+PRODUCT_TABLE_COL_WIDTHS = [3*inch, 1*inch, 1.5*inch, 1.5*inch]
+
+_product_rows_style = [
+    ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#333333')),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e0e0e0')),
+    ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+]
+
+# Primera tabla: encabezado + filas (las filas empiezan en 1)
+PRODUCT_TABLE_FIRST_STYLE = TableStyle([
+    # Header style
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, 0), 1, colors.HexColor('#e0e0e0')),
+    ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+] + [
+    # Data style
+    (command, (start[0], start[1] + 1), end, *args)
+    for command, start, end, *args in _product_rows_style
+])
+
+# Tablas siguientes: solo filas, con los mismos anchos de columna para que se vean continuas
+PRODUCT_TABLE_STYLE = TableStyle(_product_rows_style)
+
+
+def product_row(item: QuotationItemResponse) -> list:
+    return [
+        item.product_name,
+        str(item.quantity),
+        f"${item.unit_price:,.2f}",
+        f"${item.subtotal:,.2f}"
+    ]
+
+
+def product_tables(items: List[QuotationItemResponse]):
+    """Yield the products table split in page-sized tables"""
+    for start in range(0, max(len(items), 1), PRODUCT_ROWS_PER_TABLE):
+        rows = [product_row(item) for item in items[start:start + PRODUCT_ROWS_PER_TABLE]]
+        if start == 0:
+            yield Table([PRODUCT_TABLE_HEADER] + rows, colWidths=PRODUCT_TABLE_COL_WIDTHS, style=PRODUCT_TABLE_FIRST_STYLE)
+        else:
+            yield Table(rows, colWidths=PRODUCT_TABLE_COL_WIDTHS, style=PRODUCT_TABLE_STYLE)
+
 
 def generate_quotation_pdf(
     quotation_number: str,
     user: UserResponse,
     items: List[QuotationItemResponse],
     total_amount: Decimal,
-    output_buffer: io.BytesIO
-) -> io.BytesIO:
-    """Generate a PDF quotation document"""
+    output_buffer: BinaryIO,
+    quotation_date: Optional[datetime] = None
+) -> BinaryIO:
+    """Generate a PDF quotation document into a binary file object"""
     
     doc = SimpleDocTemplate(output_buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
     story = []
     
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=12
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#666666')
-    )
-    
     # Title
-    story.append(Paragraph("AureumPOS", title_style))
+    story.append(Paragraph("AureumPOS", TITLE_STYLE))
     story.append(Spacer(1, 0.2*inch))
     
     # Quotation Number
-    story.append(Paragraph(f"Cotización #{quotation_number}", heading_style))
+    story.append(Paragraph(f"Cotización #{quotation_number}", HEADING_STYLE))
     story.append(Spacer(1, 0.1*inch))
     
     # Date
-    date_str = datetime.now().strftime("%d de %B de %Y")
-    story.append(Paragraph(f"Fecha: {date_str}", normal_style))
+    date_str = (quotation_date or datetime.now()).strftime("%d de %B de %Y")
+    story.append(Paragraph(f"Fecha: {date_str}", NORMAL_STYLE))
     story.append(Spacer(1, 0.3*inch))
     
     # Client Information
-    story.append(Paragraph("Información del Cliente", heading_style))
+    story.append(Paragraph("Información del Cliente", HEADING_STYLE))
     client_data = [
         ["Nombre:", f"{user.first_name} {user.last_name}"],
         ["Email:", user.email],
@@ -74,88 +169,39 @@ def generate_quotation_pdf(
     if user.phone:
         client_data.append(["Teléfono:", user.phone])
     
-    client_table = Table(client_data, colWidths=[2*inch, 4*inch])
-    client_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#333333')),
-        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#666666')),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    story.append(client_table)
+    story.append(Table(client_data, colWidths=[2*inch, 4*inch], style=CLIENT_TABLE_STYLE))
     story.append(Spacer(1, 0.3*inch))
     
     # Products Table
-    story.append(Paragraph("Detalle de Productos", heading_style))
-    
-    # Table headers
-    table_data = [["Producto", "Cantidad", "Precio Unitario", "Subtotal"]]
-    
-    # Table rows
-    for item in items:
-        table_data.append([
-            item.product_name,
-            str(item.quantity),
-            f"${item.unit_price:,.2f}",
-            f"${item.subtotal:,.2f}"
-        ])
-    
-    # Create table
-    products_table = Table(table_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
-    products_table.setStyle(TableStyle([
-        # Header style
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        # Data style
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#333333')),
-        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e0e0e0')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    story.append(products_table)
+    story.append(Paragraph("Detalle de Productos", HEADING_STYLE))
+    story.extend(product_tables(items))
     story.append(Spacer(1, 0.3*inch))
     
     # Total
-    total_style = ParagraphStyle(
-        'TotalStyle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#1a1a1a'),
-        alignment=TA_RIGHT,
-        fontName='Helvetica-Bold'
-    )
-    story.append(Paragraph(f"Total: ${total_amount:,.2f}", total_style))
+    story.append(Paragraph(f"Total: ${total_amount:,.2f}", TOTAL_STYLE))
     story.append(Spacer(1, 0.3*inch))
     
     # Footer
-    footer_style = ParagraphStyle(
-        'FooterStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#999999'),
-        alignment=TA_CENTER
-    )
     story.append(Spacer(1, 0.5*inch))
-    story.append(Paragraph("Gracias por su preferencia", footer_style))
-    story.append(Paragraph("AureumPOS - Sistema de Punto de Venta", footer_style))
+    story.append(Paragraph("Gracias por su preferencia", FOOTER_STYLE))
+    story.append(Paragraph("AureumPOS - Sistema de Punto de Venta", FOOTER_STYLE))
     
     # Build PDF
     doc.build(story)
     output_buffer.seek(0)
     return output_buffer
 
+
+def write_quotation_pdf(
+    path: str,
+    quotation_number: str,
+    user: UserResponse,
+    items: List[QuotationItemResponse],
+    total_amount: Decimal,
+    quotation_date: Optional[datetime] = None
+) -> int:
+    """Render a PDF quotation document to a file (runs in the PDF process pool), return its size"""
+    with open(path, "wb") as output_file:
+        generate_quotation_pdf(quotation_number, user, items, total_amount, output_file, quotation_date)
+        output_file.seek(0, io.SEEK_END)
+        return output_file.tell()
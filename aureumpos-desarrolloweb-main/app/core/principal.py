@@ -0,0 +1,88 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.cache import TTLCache
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Usuario autenticado, para las rutas que solo necesitan saber quién llama"""
+    id: int
+    email: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(id=user.id, email=user.email, is_admin=bool(user.is_admin))
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["UserPrincipal"]:
+        """Principal armado con los claims del token, o None si el token no los trae"""
+        try:
+            return cls(id=int(payload["sub"]), email=str(payload["email"]), is_admin=bool(payload["is_admin"]))
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def claims(self) -> dict:
+        """Claims del access token para este usuario"""
+        return {"sub": str(self.id), "email": self.email, "is_admin": self.is_admin}
+
+
+# Usuarios ya verificados contra la base de datos, por id; las rutas de administración
+# confirman el rol aquí, así otro worker ve un cambio a más tardar al vencer el TTL
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL
+)
+
+# Momento (time.monotonic) de la última invalidación de cada usuario en este proceso
+_invalidated_at = TTLCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE,
+    ttl=settings.AUTH_PRINCIPAL_CACHE_TTL
+)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Descartar un usuario de la caché para que la siguiente petición lo vuelva a leer"""
+    _invalidated_at.set(user_id, time.monotonic())
+    principal_cache.delete(user_id)
+
+
+def remember_principal(user: User, read_started: float) -> UserPrincipal:
+    """Guardar en la caché un usuario leído a partir de read_started
+
+    Si el usuario se invalidó después de empezar la lectura, la fila puede ser
+    anterior al cambio y no se guarda.
+    """
+    principal = UserPrincipal.from_user(user)
+    if _invalidated_at.get(principal.id, 0.0) < read_started:
+        principal_cache.set(principal.id, principal)
+    return principal
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    # Durante after_flush dirty y deleted todavía muestran lo que se acaba de escribir
+    user_ids = {
+        obj.id for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if user_ids:
+        session.info.setdefault("changed_user_ids", set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    # Solo se invalida lo confirmado: un rollback no toca la caché y nadie
+    # vuelve a guardar la fila vieja antes de que el cambio sea visible
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional, Union
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+from app.models.cart import Cart
+from app.models.category import Category
+from app.models.product import Product
+from app.models.quotation import Quotation, QuotationItem
+
+# Modelos de lectura de los GET: cada uno tiene los campos de su schema de respuesta,
+# en el mismo orden, y se llena desde una consulta proyectada (solo esas columnas).
+# No pasan por el identity map del ORM ni por la validación de Pydantic; se
+# serializan directo con pydantic-core (dump_json en app/core/serialization.py) y el JSON
+# es el mismo que el de los schemas.
+
+
+@dataclass(slots=True)
+class ProductRow:
+    """ProductResponse leído de PRODUCT_ROW_COLUMNS"""
+    name: str
+    price: Decimal
+    image_url: Optional[str]
+    category_id: int
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+PRODUCT_ROW_COLUMNS = (
+    Product.name, Product.price, Product.image_url, Product.category_id,
+    Product.id, Product.created_at, Product.updated_at
+)
+
+
+@dataclass(slots=True)
+class CartItemRow:
+    """CartItemResponse con su producto como ProductRow"""
+    id: int
+    product_id: int
+    product: ProductRow
+    quantity: int
+    unit_price: Decimal
+    subtotal: Decimal
+
+
+@dataclass(slots=True)
+class CartRow:
+    """CartResponse leído de CART_ROW_COLUMNS, con sus items"""
+    id: int
+    user_id: int
+    items: List[CartItemRow]
+    total: Decimal
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+CART_ROW_COLUMNS = (Cart.id, Cart.user_id, Cart.created_at, Cart.updated_at)
+
+
+@dataclass(slots=True)
+class CategoryRow:
+    """CategoryResponse leído de CATEGORY_ROW_COLUMNS, con la cantidad de productos"""
+    name: str
+    image_url: Optional[str]
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+    product_count: int
+
+
+CATEGORY_ROW_COLUMNS = (Category.name, Category.image_url, Category.id, Category.created_at, Category.updated_at)
+
+
+@dataclass(slots=True)
+class QuotationItemRow:
+    """QuotationItemResponse leído de QUOTATION_ITEM_ROW_COLUMNS"""
+    id: int
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_price: Decimal
+    subtotal: Decimal
+
+
+QUOTATION_ITEM_ROW_COLUMNS = (
+    QuotationItem.id, QuotationItem.product_id, QuotationItem.product_name,
+    QuotationItem.quantity, QuotationItem.unit_price, QuotationItem.subtotal
+)
+
+
+@dataclass(slots=True)
+class QuotationRow:
+    """QuotationResponse leído de QUOTATION_ROW_COLUMNS; load_quotation_items llena los items"""
+    id: int
+    quotation_number: str
+    user_id: int
+    total_amount: Decimal
+    items: List[QuotationItemRow]
+    created_at: datetime
+
+
+QUOTATION_ROW_COLUMNS = (
+    Quotation.id, Quotation.quotation_number, Quotation.user_id, Quotation.total_amount, Quotation.created_at
+)
+
+
+@dataclass(slots=True)
+class QuotationSummaryRow:
+    """QuotationSummary leído de QUOTATION_ROW_COLUMNS, con la cantidad de items"""
+    id: int
+    quotation_number: str
+    user_id: int
+    total_amount: Decimal
+    item_count: int
+    created_at: datetime
+
+
+@dataclass(slots=True)
+class ProductPageRows:
+    """ProductPage con modelos de lectura"""
+    items: List[ProductRow]
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+
+@dataclass(slots=True)
+class QuotationPageRows:
+    """QuotationPage con modelos de lectura"""
+    items: List[Union[QuotationRow, QuotationSummaryRow]]
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+
+def product_rows(rows: Iterable) -> List[ProductRow]:
+    return [ProductRow(*row) for row in rows]
+
+
+def product_counts_subquery(db: Session):
+    """Cantidad de productos por categoría, como subconsulta agrupada para un outer join"""
+    return (
+        db.query(
+            Product.category_id.label("category_id"),
+            func.count(Product.id).label("product_count")
+        )
+        .group_by(Product.category_id)
+        .subquery()
+    )
+
+
+def query_category_rows(db: Session) -> Query:
+    """Columnas de las categorías con su cantidad de productos en una consulta agrupada"""
+    product_counts = product_counts_subquery(db)
+    return db.query(
+        *CATEGORY_ROW_COLUMNS,
+        func.coalesce(product_counts.c.product_count, 0)
+    ).outerjoin(product_counts, product_counts.c.category_id == Category.id)
+
+
+def category_rows(rows: Iterable) -> List[CategoryRow]:
+    return [CategoryRow(*row) for row in rows]
+
+
+def quotation_rows(rows: Iterable) -> List[QuotationRow]:
+    """QuotationRows todavía sin items, de filas que empiezan con QUOTATION_ROW_COLUMNS"""
+    return [QuotationRow(row[0], row[1], row[2], row[3], [], row[4]) for row in rows]
+
+
+def load_quotation_items(db: Session, quotations: List[QuotationRow], criterion=None) -> List[QuotationRow]:
+    """Llenar los items de las cotizaciones con una consulta adicional
+    
+    Por defecto los items se buscan por los ids de las cotizaciones; con `criterion`
+    se eligen de otra forma (p. ej. todas las cotizaciones de un usuario) en lugar de
+    una lista IN larga.
+    """
+    by_id = {quotation.id: quotation for quotation in quotations}
+    if not by_id:
+        return quotations
+    if criterion is None:
+        criterion = QuotationItem.quotation_id.in_(list(by_id))
+    rows = db.query(QuotationItem.quotation_id, *QUOTATION_ITEM_ROW_COLUMNS).filter(criterion).order_by(QuotationItem.id)
+    for quotation_id, *values in rows:
+        # Una cotización confirmada entre las dos consultas no está en la lista: se omiten sus items
+        quotation = by_id.get(quotation_id)
+        if quotation is not None:
+            quotation.items.append(QuotationItemRow(*values))
+    return quotations
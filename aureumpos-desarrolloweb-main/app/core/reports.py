@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models.product import Product
+from app.models.quotation import Quotation, QuotationItem
+from app.models.report import ReportDailyProduct, ReportDaily, ReportDailyCustomer, ReportState
+
+REPORT_STATE_NAME = "quotations"
+
+
+def get_report_state(db: Session) -> ReportState:
+    """Fila de estado de la actualización, creada la primera vez que se usa"""
+    state = db.get(ReportState, REPORT_STATE_NAME)
+    if state is None:
+        db.execute(
+            dialect_insert(db, ReportState)
+            .values(name=REPORT_STATE_NAME, last_quotation_id=0)
+            .on_conflict_do_nothing(index_elements=[ReportState.name])
+        )
+        db.commit()
+        state = db.get(ReportState, REPORT_STATE_NAME)
+    return state
+
+
+def _upsert_adding(db: Session, model, source, columns, keys, replace=()):
+    """INSERT ... SELECT que suma los totales nuevos a una fila de resumen existente"""
+    stmt = dialect_insert(db, model).from_select(columns, source)
+    set_ = {
+        column: getattr(model, column) + getattr(stmt.excluded, column)
+        for column in columns if column not in keys and column not in replace
+    }
+    set_.update({column: getattr(stmt.excluded, column) for column in replace})
+    db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=set_))
+
+
+def refresh_report_batch(db: Session) -> Optional[int]:
+    """Agregar el siguiente lote de cotizaciones a las tablas de resumen
+    
+    Devuelve cuántas cotizaciones se agregaron, o None si no hay nada nuevo
+    (o si otro worker está actualizando el mismo lote).
+    """
+    last_id = get_report_state(db).last_quotation_id
+    # Las cotizaciones muy recientes se dejan para la próxima vuelta: una transacción
+    # aún abierta podría confirmar un id menor al último agregado
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.REPORTS_REFRESH_LAG_SECONDS)
+    batch_ids = (
+        select(Quotation.id)
+        .where(Quotation.id > last_id, Quotation.created_at < cutoff)
+        .order_by(Quotation.id)
+        .limit(settings.REPORTS_REFRESH_BATCH)
+        .subquery()
+    )
+    upper_id, quotation_count = db.execute(
+        select(func.max(batch_ids.c.id), func.count(batch_ids.c.id))
+    ).one()
+    if upper_id is None:
+        db.rollback()
+        return None
+    
+    # Avanzar la marca de forma condicional: de dos workers refrescando a la vez solo uno
+    # agrega el lote (en PostgreSQL el otro espera el bloqueo de la fila y no la encuentra)
+    claimed = db.query(ReportState).filter(
+        ReportState.name == REPORT_STATE_NAME,
+        ReportState.last_quotation_id == last_id
+    ).update(
+        {ReportState.last_quotation_id: upper_id, ReportState.refreshed_at: func.now()},
+        synchronize_session=False
+    )
+    if not claimed:
+        db.rollback()
+        return None
+    
+    day = func.date(Quotation.created_at)
+    in_batch = and_(Quotation.id > last_id, Quotation.id <= upper_id)
+    
+    _upsert_adding(
+        db,
+        ReportDailyProduct,
+        select(
+            day,
+            QuotationItem.product_id,
+            Product.category_id,
+            func.count(QuotationItem.id),
+            func.sum(QuotationItem.quantity),
+            func.sum(QuotationItem.subtotal)
+        )
+        .select_from(QuotationItem)
+        .join(Quotation, Quotation.id == QuotationItem.quotation_id)
+        .outerjoin(Product, Product.id == QuotationItem.product_id)
+        .where(in_batch)
+        .group_by(day, QuotationItem.product_id, Product.category_id),
+        ["day", "product_id", "category_id", "quotation_count", "quantity", "revenue"],
+        keys=["day", "product_id"],
+        replace=["category_id"]
+    )
+    _upsert_adding(
+        db,
+        ReportDaily,
+        select(
+            day,
+            func.count(func.distinct(Quotation.id)),
+            func.count(QuotationItem.id),
+            func.coalesce(func.sum(QuotationItem.quantity), 0),
+            func.coalesce(func.sum(QuotationItem.subtotal), 0)
+        )
+        .select_from(Quotation)
+        .outerjoin(QuotationItem, QuotationItem.quotation_id == Quotation.id)
+        .where(in_batch)
+        .group_by(day),
+        ["day", "quotation_count", "line_count", "units", "revenue"],
+        keys=["day"]
+    )
+    db.execute(
+        dialect_insert(db, ReportDailyCustomer)
+        .from_select(
+            ["day", "user_id"],
+            select(day, Quotation.user_id).where(in_batch).distinct()
+        )
+        .on_conflict_do_nothing(index_elements=[ReportDailyCustomer.day, ReportDailyCustomer.user_id])
+    )
+    
+    db.commit()
+    return quotation_count
+
+
+def refresh_reports(db: Session, full: bool = False) -> dict:
+    """Poner al día las tablas de resumen; con `full` se recalculan desde cero"""
+    if full:
+        # Bloquear la fila de estado antes de vaciar: un refresco concurrente falla su avance condicional
+        get_report_state(db)
+        db.query(ReportState).filter(ReportState.name == REPORT_STATE_NAME).update(
+            {ReportState.last_quotation_id: 0}, synchronize_session=False
+        )
+        db.query(ReportDailyProduct).delete(synchronize_session=False)
+        db.query(ReportDaily).delete(synchronize_session=False)
+        db.query(ReportDailyCustomer).delete(synchronize_session=False)
+        db.commit()
+    
+    processed = 0
+    while True:
+        count = refresh_report_batch(db)
+        if count is None:
+            break
+        processed += count
+    
+    state = get_report_state(db)
+    return {
+        "processed_quotations": processed,
+        "last_quotation_id": state.last_quotation_id,
+        "refreshed_at": state.refreshed_at
+    }
+
+
+def _refresh_reports_in_session() -> dict:
+    db = SessionLocal()
+    try:
+        return refresh_reports(db)
+    finally:
+        db.close()
+
+
+async def run_report_refresher() -> None:
+    """Actualizar las tablas de resumen cada REPORTS_REFRESH_SECONDS (tarea en segundo plano)"""
+    while True:
+        try:
+            await run_in_threadpool(_refresh_reports_in_session)
+        except Exception as e:
+            print(f"⚠️ Error al actualizar los reportes: {e}")
+        await asyncio.sleep(settings.REPORTS_REFRESH_SECONDS)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+from fastapi import Response, status
+from app.core.serialization import dump_json
+from app.config import settings
+from app.core.cache import TTLCache
+
+try:
+    import redis
+    import redis.asyncio
+    from redis.exceptions import RedisError
+except ImportError:  # redis es opcional: solo hace falta con CATALOG_CACHE_REDIS_URL
+    redis = None
+    RedisError = OSError
+
+logger = logging.getLogger(__name__)
+
+# Los clientes y CDNs pueden guardar la respuesta pero deben revalidarla con If-None-Match
+CATALOG_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparar el header If-None-Match con el ETag de un recurso"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def body_etag(body: bytes) -> str:
+    """ETag fuerte del cuerpo de una respuesta"""
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+class ResponseCache:
+    """Respuestas JSON ya serializadas con su ETag, en un LRU del proceso y opcionalmente en Redis
+    
+    La capa local es por worker; Redis, si está configurado, comparte los cuerpos entre
+    workers. invalidate() limpia este worker y Redis a la vez; los demás workers
+    descartan su copia local al vencer el TTL.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, redis_url: str = ""):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_sync = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _redis_key(self) -> str:
+        return f"aureumpos:{self.namespace}"
+
+    def _get_redis(self):
+        if self._redis is None:
+            _require_redis()
+            self._redis = redis.asyncio.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _get_redis_sync(self):
+        # Las rutas de administración son síncronas e invalidan desde el threadpool
+        if self._redis_sync is None:
+            _require_redis()
+            self._redis_sync = redis.Redis.from_url(self.redis_url)
+        return self._redis_sync
+
+    async def get(self, key: Hashable) -> Optional[Tuple[str, bytes]]:
+        """(etag, cuerpo) de una respuesta guardada, o None si no está"""
+        entry = self._local.get(key)
+        if entry is not None or not self.redis_url:
+            return entry
+        generation = self._generation
+        try:
+            stored = await self._get_redis().hget(self._redis_key(), json.dumps(key))
+        except (RedisError, OSError) as exc:
+            # Sin Redis se sigue sirviendo desde la base de datos
+            logger.warning("Caché Redis no disponible: %s", exc)
+            return None
+        if stored is None:
+            return None
+        etag, body = stored.split(b"\n", 1)
+        entry = (etag.decode("ascii"), body)
+        self._set_local(key, entry, generation)
+        return entry
+
+    def _set_local(self, key: Hashable, entry: Tuple[str, bytes], generation: int) -> None:
+        # Una respuesta leída antes de una invalidación no debe volver a la caché
+        with self._lock:
+            if generation == self._generation:
+                self._local.set(key, entry)
+
+    async def set(self, key: Hashable, entry: Tuple[str, bytes], generation: int) -> None:
+        self._set_local(key, entry, generation)
+        if not self.redis_url or generation != self._generation:
+            return
+        etag, body = entry
+        try:
+            async with self._get_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(self._redis_key(), json.dumps(key), etag.encode("ascii") + b"\n" + body)
+                # El TTL es del hash completo: toda la caché compartida se renueva cada TTL segundos
+                pipe.expire(self._redis_key(), int(self.ttl), nx=True)
+                await pipe.execute()
+        except (RedisError, OSError) as exc:
+            logger.warning("Caché Redis no disponible: %s", exc)
+
+    def invalidate(self) -> None:
+        """Descartar todas las respuestas guardadas; se llama después de confirmar un cambio del catálogo"""
+        with self._lock:
+            self._generation += 1
+            self._local.clear()
+        if not self.redis_url:
+            return
+        try:
+            self._get_redis_sync().delete(self._redis_key())
+        except (RedisError, OSError) as exc:
+            logger.warning("No se pudo invalidar la caché Redis: %s", exc)
+
+    async def respond(
+        self,
+        key: Hashable,
+        if_none_match: Optional[str],
+        producer: Callable[[], Awaitable[Any]],
+        serialize: Callable[[Any], bytes] = dump_json
+    ) -> Response:
+        """Responder desde la caché, generando y guardando la respuesta si no está
+        
+        El producer devuelve schemas o modelos de lectura, que pydantic-core serializa
+        una sola vez. Responde 304 si If-None-Match trae el ETag actual. Los errores
+        del producer (p. ej. 404) se propagan y no se guardan.
+        """
+        entry = await self.get(key) if self.enabled else None
+        if entry is None:
+            generation = self._generation
+            value = await producer()
+            body = serialize(value)
+            entry = (body_etag(body), body)
+            if self.enabled:
+                await self.set(key, entry, generation)
+
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _require_redis() -> None:
+    if redis is None:
+        raise RuntimeError("CATALOG_CACHE_REDIS_URL requiere el paquete redis (pip install redis)")
+
+
+# Respuestas de los listados y detalles públicos de productos y categorías
+catalog_cache = ResponseCache(
+    namespace="catalog",
+    maxsize=settings.CATALOG_CACHE_SIZE,
+    ttl=settings.CATALOG_CACHE_TTL,
+    redis_url=settings.CATALOG_CACHE_REDIS_URL
+)
@@ -0,0 +1,104 @@
+import re
+import unicodedata
+from typing import Optional
+from sqlalchemy import Float, Integer, column, func, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+from app.models.product import Product
+
+# Umbral de similitud por palabra (pg_trgm.word_similarity_threshold) del operador %>
+WORD_SIMILARITY_THRESHOLD = "0.5"
+
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+]
+
+
+def normalize_search_term(term: str) -> str:
+    """Pasar el término de búsqueda a minúsculas y quitarle los acentos (igual que unaccent)"""
+    decomposed = unicodedata.normalize("NFKD", term.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+def ensure_product_search(engine: Engine) -> None:
+    """Crear en SQLite la tabla FTS5 de búsqueda de productos
+    
+    En PostgreSQL el índice trigram lo crea la migración 0002_products_search.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        ).first()
+        for statement in SQLITE_FTS_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+
+def search_products(query: Query, term: str) -> Optional[Query]:
+    """Filtrar y ordenar por relevancia una consulta de productos según el término buscado
+    
+    Devuelve None si el término no tiene nada que buscar.
+    """
+    normalized = normalize_search_term(term)
+    if not normalized:
+        return None
+
+    dialect = query.session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        # El umbral de %> se fija solo para la transacción en curso
+        query.session.execute(
+            select(func.set_config("pg_trgm.word_similarity_threshold", WORD_SIMILARITY_THRESHOLD, True))
+        )
+        # f_unaccent(lower(name)) es la misma expresión del índice GIN trigram; LIKE y %>
+        # usan ese índice, word_similarity() solo ordena los resultados
+        indexed_name = func.f_unaccent(func.lower(Product.name))
+        return query.filter(
+            or_(
+                indexed_name.contains(normalized, autoescape=True),
+                indexed_name.bool_op("%>")(normalized)
+            )
+        ).order_by(func.word_similarity(normalized, indexed_name).desc(), Product.id)
+
+    if dialect == "sqlite":
+        tokens = re.findall(r"\w+", normalized)
+        if not tokens:
+            return None
+        # Cada palabra como prefijo: "taza cer" encuentra "Taza Cerámica"
+        match = " ".join(f'"{token}"*' for token in tokens)
+        matches = (
+            text("SELECT rowid, bm25(products_fts) AS rank FROM products_fts WHERE products_fts MATCH :match")
+            .bindparams(match=match)
+            .columns(column("rowid", Integer), column("rank", Float))
+            .subquery("products_fts_matches")
+        )
+        return query.join(matches, matches.c.rowid == Product.id).order_by(matches.c.rank, Product.id)
+
+    # Otros motores: búsqueda por subcadena sin índice
+    return query.filter(Product.name.ilike(f"%{term.lower()}%")).order_by(Product.name, Product.id)
@@ -1,30 +1,109 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
+import asyncio
+import hashlib
+import multiprocessing
+import secrets
+import threading
 import bcrypt
 from app.config import settings
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash"""
+def _password_bytes(password: str) -> bytes:
     # Bcrypt tiene un límite de 72 bytes, truncar si es necesario
-    password_bytes = plain_password.encode('utf-8')
+    password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
-    return bcrypt.checkpw(password_bytes, hashed_password.encode('utf-8'))
+    return password_bytes
+
 
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash"""
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode('utf-8'))
 
-def get_password_hash(password: str) -> str:
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
     """Hash a password"""
-    # Bcrypt tiene un límite de 72 bytes, truncar si es necesario
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
     return hashed.decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        # Formato: $2b$<costo>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# Pool de procesos para bcrypt: cada hash cuesta ~250ms de CPU y no debe ocupar
+# el threadpool ni el event loop del worker
+_password_executor: Optional[ProcessPoolExecutor] = None
+_password_pending = 0
+_password_lock = threading.Lock()
+
+
+def _get_password_executor() -> Optional[ProcessPoolExecutor]:
+    global _password_executor
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _password_lock:
+        if _password_executor is None:
+            # spawn: los procesos hijos no heredan las conexiones abiertas del pool de la base de datos
+            _password_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _password_executor
+
+
+def shutdown_password_executor() -> None:
+    """Stop the password hashing process pool"""
+    global _password_executor
+    with _password_lock:
+        if _password_executor is not None:
+            _password_executor.shutdown(wait=False, cancel_futures=True)
+            _password_executor = None
+
+
+async def _run_password_work(fn, *args):
+    """Run bcrypt work in the process pool, or fail fast with 429 when saturated"""
+    global _password_pending
+    with _password_lock:
+        if _password_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados inicios de sesión simultáneos, intenta de nuevo en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+        _password_pending += 1
+    try:
+        executor = _get_password_executor()
+        if executor is None:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        with _password_lock:
+            _password_pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash in the password process pool"""
+    return await _run_password_work(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the password process pool"""
+    # El costo se pasa explícito: el proceso hijo no ve cambios hechos a settings en este proceso
+    return await _run_password_work(get_password_hash, password, settings.BCRYPT_ROUNDS)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -37,6 +116,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_refresh_token() -> str:
+    """Create an opaque refresh token (only its hash is stored)"""
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage and lookup"""
+    # SHA-256 basta: el token es aleatorio de 256 bits, no hace falta bcrypt
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode and verify a JWT token"""
     try:
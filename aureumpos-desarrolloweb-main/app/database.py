@@ -1,19 +1,72 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi.concurrency import run_in_threadpool
 from app.config import settings
+from app.core.metrics import pool_metrics, request_metrics, InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
+# Motores soportados: las escrituras usan INSERT ... ON CONFLICT de estos dialectos
+SUPPORTED_DIALECTS = ("postgresql", "sqlite")
+
+
+def pool_options(url: str, poolclass) -> dict:
+    """Opciones del pool de conexiones según la configuración"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        # SQLite usa el pool por defecto de SQLAlchemy
+        return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+backend = make_url(settings.DATABASE_URL).get_backend_name()
+if backend not in SUPPORTED_DIALECTS:
+    raise RuntimeError(f"DATABASE_URL usa {backend}; AureumPOS solo soporta PostgreSQL y SQLite")
 
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=False
+    echo=False,
+    **pool_options(settings.DATABASE_URL, InstrumentedQueuePool)
 )
+pool_metrics.track(engine.pool)
+request_metrics.track(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono, solo si DATABASE_ASYNC está activo
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        settings.async_database_url,
+        echo=False,
+        **pool_options(settings.async_database_url, InstrumentedAsyncQueuePool)
+    )
+    pool_metrics.track(async_engine.sync_engine.pool)
+    request_metrics.track(async_engine.sync_engine)
+    # expire_on_commit=False: tras el commit no se puede recargar un atributo fuera de run_sync
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
+def dialect_insert(db, model):
+    """INSERT del dialecto en uso, con soporte de ON CONFLICT (PostgreSQL y SQLite)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    # El motor se valida al crearlo (SUPPORTED_DIALECTS): el otro caso es SQLite
+    return sqlite.insert(model)
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -22,3 +75,25 @@ def get_db():
     finally:
         db.close()
 
+
+
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Sesión de las rutas que soportan ambos modos: AsyncSession con DATABASE_ASYNC,
+# o la misma sesión síncrona de get_db (una sola sesión por petición)
+get_session = get_async_db if settings.DATABASE_ASYNC else get_db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Ejecutar fn(session, *args, **kwargs), código ORM escrito para una Session síncrona
+    
+    Con AsyncSession corre dentro de run_sync y la E/S espera en el event loop;
+    con una Session síncrona corre en el threadpool, como las rutas síncronas.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
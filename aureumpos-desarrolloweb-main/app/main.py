@@ -1,15 +1,24 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
-from app.api.routes import auth, categories, products, carts, quotations
-from app.models import User, Category, Product, Cart, CartItem, Quotation, QuotationItem
-from app.core.security import get_password_hash
+from app.database import engine, async_engine, Base
+from app.api.routes import auth, categories, products, catalog, carts, quotations, metrics, reports
+from app.models import (
+    User, Category, Product, Cart, CartItem, Quotation, QuotationItem, RefreshToken,
+    ReportDailyProduct, ReportDaily, ReportDailyCustomer, ReportState, CatalogState, CatalogDeletedProduct
+)
+from app.core.security import get_password_hash, shutdown_password_executor
+from app.core.search import ensure_product_search
+from app.core.pdf_cache import shutdown_render_executor
+from app.core.reports import run_report_refresher
+from app.core.metrics import RequestMetricsMiddleware
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 
 # Crear tablas
 Base.metadata.create_all(bind=engine)
+ensure_product_search(engine)
 
 app = FastAPI(
     title="AureumPOS API",
@@ -27,12 +36,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia, sentencias SQL y tamaño de respuesta por ruta (GET /metrics); va por fuera de CORS
+app.add_middleware(RequestMetricsMiddleware)
+
 # Incluir routers
 app.include_router(auth.router)
 app.include_router(categories.router)
 app.include_router(products.router)
+app.include_router(catalog.router)
 app.include_router(carts.router)
 app.include_router(quotations.router)
+app.include_router(metrics.router)
+app.include_router(reports.router)
 
 
 @app.on_event("startup")
@@ -63,6 +78,22 @@ async def startup_event():
         traceback.print_exc()
     finally:
         db.close()
+    
+    # Actualizar las tablas de resumen de los reportes en segundo plano
+    app.state.report_refresher = None
+    if settings.REPORTS_REFRESH_SECONDS > 0:
+        app.state.report_refresher = asyncio.create_task(run_report_refresher())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cerrar las conexiones del motor asíncrono, los pools de procesos y las tareas en segundo plano"""
+    if app.state.report_refresher is not None:
+        app.state.report_refresher.cancel()
+    if async_engine is not None:
+        await async_engine.dispose()
+    shutdown_password_executor()
+    shutdown_render_executor()
 
 
 @app.get("/")
@@ -3,6 +3,13 @@ from app.models.category import Category
 from app.models.product import Product
 from app.models.cart import Cart, CartItem
 from app.models.quotation import Quotation, QuotationItem
+from app.models.refresh_token import RefreshToken
+from app.models.report import ReportDailyProduct, ReportDaily, ReportDailyCustomer, ReportState
+from app.models.catalog import CatalogState, CatalogDeletedProduct
 
-__all__ = ["User", "Category", "Product", "Cart", "CartItem", "Quotation", "QuotationItem"]
+__all__ = [
+    "User", "Category", "Product", "Cart", "CartItem", "Quotation", "QuotationItem", "RefreshToken",
+    "ReportDailyProduct", "ReportDaily", "ReportDailyCustomer", "ReportState",
+    "CatalogState", "CatalogDeletedProduct"
+]
 
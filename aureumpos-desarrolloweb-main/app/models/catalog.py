@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+# Versión del catálogo para el snapshot de las terminales (ver app/core/catalog.py).
+# Cada cambio de un admin toma la versión siguiente; los productos guardan la
+# versión en que cambiaron por última vez y los borrados quedan en una lápida
+
+
+class CatalogState(Base):
+    """Última versión del catálogo"""
+    __tablename__ = "catalog_state"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CatalogDeletedProduct(Base):
+    """Producto borrado y la versión del catálogo en que se borró"""
+    __tablename__ = "catalog_deleted_products"
+
+    product_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, index=True)
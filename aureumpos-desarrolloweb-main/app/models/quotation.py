@@ -1,14 +1,54 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, Sequence, Index
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import FunctionElement
 from app.database import Base
 
+# Contador de números de cotización (solo PostgreSQL; en SQLite no se crea)
+quotation_number_seq = Sequence("quotation_number_seq", metadata=Base.metadata)
+
+
+class next_quotation_number(FunctionElement):
+    """Siguiente número de cotización (COT-YYYYMMDD-00000001), calculado en el mismo INSERT
+    
+    Único y creciente sin otra consulta: PostgreSQL lo toma de `quotation_number_seq`;
+    SQLite serializa las escrituras, así que MAX(id) + 1 es seguro.
+    """
+    type = String()
+    inherit_cache = True
+
+
+@compiles(next_quotation_number, "postgresql")
+def _next_quotation_number_postgresql(element, compiler, **kw):
+    return (
+        # Ni to_char ni lpad(..., 8): pasado 99999999 el primero imprime '#########' y el
+        # segundo recorta el número; con greatest() el número se alarga a 9 dígitos
+        "'COT-' || to_char(now(), 'YYYYMMDD') || '-' || "
+        "(SELECT lpad(n::text, greatest(8, length(n::text)), '0') FROM nextval('quotation_number_seq') AS n)"
+    )
+
+
+@compiles(next_quotation_number, "sqlite")
+def _next_quotation_number_sqlite(element, compiler, **kw):
+    return (
+        "'COT-' || strftime('%Y%m%d', 'now') || '-' || "
+        "printf('%08d', (SELECT COALESCE(MAX(id), 0) + 1 FROM quotations))"
+    )
+
 
 class Quotation(Base):
     __tablename__ = "quotations"
+    __table_args__ = (
+        # Historial paginado por cursor del usuario, del más reciente al más antiguo
+        Index("ix_quotations_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    quotation_number = Column(String, unique=True, nullable=False, index=True)
+    quotation_number = Column(
+        String, unique=True, nullable=False, index=True,
+        default=next_quotation_number()  # se genera en el INSERT (ver next_quotation_number)
+    )
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_amount = Column(Numeric(10, 2), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -22,7 +62,7 @@ class QuotationItem(Base):
     __tablename__ = "quotation_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    quotation_id = Column(Integer, ForeignKey("quotations.id"), nullable=False)
+    quotation_id = Column(Integer, ForeignKey("quotations.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     product_name = Column(String, nullable=False)  # Snapshot del nombre del producto
     quantity = Column(Integer, nullable=False)
@@ -32,4 +72,3 @@ class QuotationItem(Base):
     # Relationships
     quotation = relationship("Quotation", back_populates="items")
     product = relationship("Product", back_populates="quotation_items")
-
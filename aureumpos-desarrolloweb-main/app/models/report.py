@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+# Tablas de resumen de los reportes de administración. Se llenan de forma
+# incremental a partir de quotations / quotation_items (ver app/core/reports.py)
+
+
+class ReportDailyProduct(Base):
+    """Cotizado por día y producto"""
+    __tablename__ = "report_daily_products"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True, index=True)
+    category_id = Column(Integer, index=True)  # categoría del producto al momento de agregar
+    quotation_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class ReportDaily(Base):
+    """Totales de cotizaciones por día"""
+    __tablename__ = "report_daily"
+
+    day = Column(Date, primary_key=True)
+    quotation_count = Column(Integer, nullable=False, default=0)
+    line_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class ReportDailyCustomer(Base):
+    """Clientes que cotizaron cada día (para contar clientes distintos en un rango)"""
+    __tablename__ = "report_daily_customers"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+
+class ReportState(Base):
+    """Última cotización agregada en las tablas de resumen"""
+    __tablename__ = "report_state"
+
+    name = Column(String, primary_key=True)
+    last_quotation_id = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -21,4 +21,5 @@ class User(Base):
     # Relationships
     cart = relationship("Cart", back_populates="user", uselist=False, cascade="all, delete-orphan")
     quotations = relationship("Quotation", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
 
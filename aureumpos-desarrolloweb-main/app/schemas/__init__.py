@@ -1,14 +1,28 @@
-from app.schemas.user import User, UserCreate, UserLogin, UserResponse, Token
+from app.schemas.user import User, UserCreate, UserLogin, UserResponse, Token, TokenRefresh
 from app.schemas.category import Category, CategoryCreate, CategoryUpdate, CategoryResponse
-from app.schemas.product import Product, ProductCreate, ProductUpdate, ProductResponse
-from app.schemas.cart import CartItem, CartItemCreate, CartItemUpdate, CartResponse
-from app.schemas.quotation import Quotation, QuotationCreate, QuotationResponse, QuotationItemResponse
+from app.schemas.product import (
+    Product, ProductCreate, ProductUpdate, ProductResponse, ProductPage,
+    ProductPriceChange, ProductPriceChangeResult, ProductImportError, ProductImportResult
+)
+from app.schemas.cart import CartItem, CartItemCreate, CartItemUpdate, CartResponse, CartChangeResponse
+from app.schemas.quotation import (
+    Quotation, QuotationCreate, QuotationResponse, QuotationItemResponse, QuotationSummary, QuotationPage,
+    QuotationExportProgress
+)
+from app.schemas.catalog import CatalogSnapshot, CatalogDelta
+from app.schemas.report import (
+    ProductRevenue, CategoryRevenue, DailyRevenue, BasketStats, CartConversion, ReportRefreshResult
+)
 
 __all__ = [
-    "User", "UserCreate", "UserLogin", "UserResponse", "Token",
+    "User", "UserCreate", "UserLogin", "UserResponse", "Token", "TokenRefresh",
     "Category", "CategoryCreate", "CategoryUpdate", "CategoryResponse",
-    "Product", "ProductCreate", "ProductUpdate", "ProductResponse",
-    "CartItem", "CartItemCreate", "CartItemUpdate", "CartResponse",
-    "Quotation", "QuotationCreate", "QuotationResponse", "QuotationItemResponse"
+    "Product", "ProductCreate", "ProductUpdate", "ProductResponse", "ProductPage",
+    "ProductPriceChange", "ProductPriceChangeResult", "ProductImportError", "ProductImportResult",
+    "CartItem", "CartItemCreate", "CartItemUpdate", "CartResponse", "CartChangeResponse",
+    "Quotation", "QuotationCreate", "QuotationResponse", "QuotationItemResponse", "QuotationSummary",
+    "QuotationPage", "QuotationExportProgress",
+    "CatalogSnapshot", "CatalogDelta",
+    "ProductRevenue", "CategoryRevenue", "DailyRevenue", "BasketStats", "CartConversion", "ReportRefreshResult"
 ]
 
@@ -42,6 +42,13 @@ class CartResponse(BaseModel):
         from_attributes = True
 
 
+class CartChangeResponse(BaseModel):
+    """Respuesta reducida de una modificación del carrito (?return=minimal)"""
+    cart_id: int
+    item: Optional[CartItemResponse] = None  # None si el item fue eliminado
+    total: Decimal
+
+
 class CartItem(CartItemResponse):
     pass
 
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+from app.schemas.product import ProductResponse
+from app.schemas.category import CategoryResponse
+
+
+class CatalogSnapshot(BaseModel):
+    version: int
+    products: List[ProductResponse]
+    categories: List[CategoryResponse]
+
+
+class CatalogDelta(BaseModel):
+    version: int
+    since: int
+    products: List[ProductResponse]  # creados o modificados después de `since`
+    deleted_product_ids: List[int]
+    categories: List[CategoryResponse]  # siempre completas: son pocas
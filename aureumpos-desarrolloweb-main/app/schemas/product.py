@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from decimal import Decimal
 
 
@@ -34,3 +34,33 @@ class ProductResponse(ProductBase):
 class Product(ProductResponse):
     pass
 
+
+
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+
+class ProductPriceChange(BaseModel):
+    mode: Literal["percentage", "fixed"]
+    value: Decimal
+    category_id: Optional[int] = None
+    product_ids: Optional[List[int]] = None
+
+
+class ProductPriceChangeResult(BaseModel):
+    updated_products: int
+    updated_cart_items: int
+
+
+class ProductImportError(BaseModel):
+    line: int
+    error: str
+
+
+class ProductImportResult(BaseModel):
+    created: int
+    error_count: int
+    errors: List[ProductImportError]
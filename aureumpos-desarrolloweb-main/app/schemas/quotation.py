@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List
+from typing import List, Literal, Optional, Union
 from decimal import Decimal
 
 
@@ -39,3 +39,29 @@ class QuotationResponse(BaseModel):
 class Quotation(QuotationResponse):
     pass
 
+
+class QuotationSummary(BaseModel):
+    id: int
+    quotation_number: str
+    user_id: int
+    total_amount: Decimal
+    item_count: int
+    created_at: datetime
+
+
+class QuotationPage(BaseModel):
+    items: List[Union[QuotationResponse, QuotationSummary]]
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+
+
+class QuotationExportProgress(BaseModel):
+    export_id: str
+    status: Literal["running", "done", "error"]
+    total: int
+    done: int
+    failed: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,49 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Optional
+from decimal import Decimal
+
+
+class ProductRevenue(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    category_id: Optional[int] = None
+    quotation_count: int
+    quantity: int
+    revenue: Decimal
+
+
+class CategoryRevenue(BaseModel):
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    line_count: int
+    quantity: int
+    revenue: Decimal
+
+
+class DailyRevenue(BaseModel):
+    day: date
+    quotation_count: int
+    line_count: int
+    units: int
+    revenue: Decimal
+
+
+class BasketStats(BaseModel):
+    quotation_count: int
+    revenue: Decimal
+    average_total: Decimal
+    average_lines: Decimal
+    average_units: Decimal
+
+
+class CartConversion(BaseModel):
+    active_customers: int
+    quoting_customers: int
+    conversion_rate: Decimal
+
+
+class ReportRefreshResult(BaseModel):
+    processed_quotations: int
+    last_quotation_id: int
+    refreshed_at: Optional[datetime] = None
@@ -36,5 +36,10 @@ class User(UserResponse):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user: UserResponse
 
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
@@ -0,0 +1,66 @@
+"""Benchmark de autenticación: usuario leído en cada petición vs claims del token
+
+Uso (desde la raíz del proyecto, con SQLite temporal por defecto):
+
+    python benchmarks/bench_auth.py [peticiones]
+
+Compara GET /carts con un token que solo trae el id y la caché de principales
+desactivada (un SELECT a users por petición, como antes) contra el token con
+claims, que no consulta users ni la caché.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_auth.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.main import app  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.core.principal import principal_cache  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+
+statements = []
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+def run(client: TestClient, label: str, token: str, requests: int) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    principal_cache.clear()
+    principal_cache.ttl = 0
+    client.get("/carts", headers=headers)  # calentar
+    statements.clear()
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get("/carts", headers=headers)
+    elapsed = time.perf_counter() - start
+    users_selects = sum(1 for statement in statements if "FROM users" in statement)
+    print(
+        f"{label:>14}: {elapsed / requests * 1000:.3f} ms/petición, "
+        f"{len(statements) / requests:.2f} sentencias/petición, "
+        f"{users_selects} lecturas de users"
+    )
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with TestClient(app) as client:
+        response = client.post(
+            "/auth/login",
+            json={"email": settings.ADMIN_EMAIL, "password": settings.ADMIN_PASSWORD}
+        )
+        user_id = response.json()["user"]["id"]
+        run(client, "solo id", create_access_token({"sub": str(user_id)}), requests)
+        run(client, "con claims", response.json()["access_token"], requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Benchmark de serialización de listados: entidades del ORM + encoder de FastAPI vs proyección + pydantic-core
+
+Uso (desde la raíz del proyecto, con SQLite temporal por defecto):
+
+    python benchmarks/bench_serialization.py [filas] [repeticiones]
+
+Para el listado de productos y el historial de cotizaciones (una fila por item)
+mide, normalizado a 10.000 filas, la lectura y la serialización por separado:
+antes se cargaban entidades, se validaban contra el response_model y se
+recorrían con jsonable_encoder + json.dumps; ahora se leen solo las columnas a
+modelos de lectura (app/core/read_models.py) y se serializan en una pasada. Verifica además que el JSON resultante sea idéntico.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_serialization.db")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from app.database import engine, SessionLocal, Base  # noqa: E402
+from app.models import User, Category, Product, Quotation, QuotationItem  # noqa: E402
+from app.schemas.product import ProductResponse  # noqa: E402
+from app.schemas.quotation import QuotationResponse, QuotationItemResponse  # noqa: E402
+from app.core.serialization import FastJSONResponse  # noqa: E402
+from app.api.routes.products import list_products  # noqa: E402
+from app.api.routes.quotations import read_user_quotations  # noqa: E402
+
+ITEMS_PER_QUOTATION = 10
+
+
+def build_quotation_response(quotation: Quotation) -> QuotationResponse:
+    """La respuesta como se armaba antes, desde la entidad con sus items cargados"""
+    return QuotationResponse(
+        id=quotation.id,
+        quotation_number=quotation.quotation_number,
+        user_id=quotation.user_id,
+        total_amount=quotation.total_amount,
+        items=[
+            QuotationItemResponse(
+                id=item.id,
+                product_id=item.product_id,
+                product_name=item.product_name,
+                quantity=item.quantity,
+                unit_price=item.unit_price,
+                subtotal=item.subtotal
+            )
+            for item in quotation.items
+        ],
+        created_at=quotation.created_at
+    )
+
+
+def default_render(field, content) -> bytes:
+    """Lo que hace FastAPI con el valor devuelto por una ruta con response_model"""
+    serialized = asyncio.run(serialize_response(field=field, response_content=content, is_coroutine=True))
+    return JSONResponse(serialized).body
+
+
+def seed(rows: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    category = Category(name=f"Bench {time.time_ns()}")
+    user = User(email=f"bench-{time.time_ns()}@aureumpos.com", hashed_password="x", first_name="Bench", last_name="Json")
+    db.add_all([category, user])
+    db.commit()
+    db.execute(insert(Product), [
+        {"name": f"Taza personalizada {i}", "price": Decimal("10.50") + i % 100, "category_id": category.id,
+         "image_url": f"https://example.com/{i}.jpg"}
+        for i in range(rows)
+    ])
+    for start in range(0, rows, ITEMS_PER_QUOTATION):
+        quotation = Quotation(user_id=user.id, total_amount=Decimal("105.00"))
+        db.add(quotation)
+        db.flush()
+        db.execute(insert(QuotationItem), [
+            {"quotation_id": quotation.id, "product_id": 1, "product_name": f"Taza {start + j}",
+             "quantity": 1 + j, "unit_price": Decimal("10.50"), "subtotal": Decimal("10.50") * (1 + j)}
+            for j in range(ITEMS_PER_QUOTATION)
+        ])
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def timed(fn, repeat: int):
+    """Mejor tiempo de `repeat` corridas de fn() con una sesión nueva cada vez"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            result = fn(db)
+            elapsed = time.perf_counter() - start
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compare(label: str, rows: int, repeat: int, load_before, render_before, load_after) -> None:
+    per_10k = 10000 / rows * 1000
+    load_old, loaded = timed(load_before, repeat)
+    render_old, body_old = timed(lambda db: render_before(loaded), repeat)
+    load_new, projected = timed(load_after, repeat)
+    render_new, body_new = timed(lambda db: FastJSONResponse(projected).body, repeat)
+    assert body_old == body_new, "el JSON cambió"
+    print(f"{label} ({rows} filas, ms por 10.000 filas):")
+    print(f"  antes:   lectura {load_old * per_10k:7.1f}  serialización {render_old * per_10k:7.1f}  "
+          f"total {(load_old + render_old) * per_10k:7.1f}")
+    print(f"  después: lectura {load_new * per_10k:7.1f}  serialización {render_new * per_10k:7.1f}  "
+          f"total {(load_new + render_new) * per_10k:7.1f}")
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    user_id = seed(rows)
+
+    product_field = create_response_field(name="Response_products", type_=List[ProductResponse])
+    compare(
+        "GET /products", rows, repeat,
+        lambda db: db.query(Product).all(),
+        lambda products: default_render(product_field, products),
+        lambda db: list_products(db, None, None)
+    )
+
+    quotation_field = create_response_field(name="Response_quotations", type_=List[QuotationResponse])
+    compare(
+        "GET /quotations", rows, repeat,
+        lambda db: [
+            build_quotation_response(quotation)
+            for quotation in db.query(Quotation).options(selectinload(Quotation.items)).filter(
+                Quotation.user_id == user_id
+            ).order_by(Quotation.created_at.desc(), Quotation.id.desc())
+        ],
+        lambda quotations: default_render(quotation_field, quotations),
+        lambda db: read_user_quotations(db, user_id)
+    )
+
+
+if __name__ == "__main__":
+    main()
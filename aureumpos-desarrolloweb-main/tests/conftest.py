@@ -0,0 +1,54 @@
+"""Fixtures comunes de las pruebas
+
+Por defecto se usa una base SQLite temporal; con TEST_DATABASE_URL las pruebas
+corren contra otra base (p. ej. un PostgreSQL de pruebas vacío). La configuración
+se fija antes de importar la aplicación, que la lee al importarse.
+"""
+import os
+import tempfile
+import uuid
+
+_tmp_dir = tempfile.mkdtemp(prefix="aureumpos-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{_tmp_dir}/test.db")
+os.environ["PDF_CACHE_DIR"] = os.path.join(_tmp_dir, "pdf")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["REPORTS_REFRESH_SECONDS"] = "0"
+os.environ["CATALOG_CACHE_REDIS_URL"] = ""
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(client):
+    """Headers de autorización del administrador por defecto"""
+    response = client.post(
+        "/auth/login",
+        json={"email": settings.ADMIN_EMAIL, "password": settings.ADMIN_PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def customer(client):
+    """Cliente nuevo ya logueado: respuesta del login más sus headers de autorización"""
+    email = f"cliente-{uuid.uuid4().hex[:12]}@aureumpos.com"
+    response = client.post("/auth/register", json={
+        "email": email, "password": "secreto123", "first_name": "Cliente", "last_name": "Prueba"
+    })
+    assert response.status_code == 201, response.text
+    response = client.post("/auth/login", json={"email": email, "password": "secreto123"})
+    assert response.status_code == 200, response.text
+    login = response.json()
+    login["headers"] = {"Authorization": f"Bearer {login['access_token']}"}
+    return login
@@ -0,0 +1,34 @@
+def refresh(client, refresh_token: str):
+    return client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_the_token(client, customer):
+    response = refresh(client, customer["refresh_token"])
+    assert response.status_code == 200, response.text
+    renewed = response.json()
+    assert renewed["refresh_token"] != customer["refresh_token"]
+    assert renewed["user"]["id"] == customer["user"]["id"]
+    
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {renewed['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["email"] == customer["user"]["email"]
+
+
+def test_reused_refresh_token_is_rejected_and_revokes_the_session(client, customer):
+    renewed = refresh(client, customer["refresh_token"]).json()
+    
+    # El token ya rotado se rechaza y se revocan todos los del usuario, también el nuevo
+    response = refresh(client, customer["refresh_token"])
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert refresh(client, renewed["refresh_token"]).status_code == 401
+
+
+def test_logout_revokes_the_refresh_token(client, customer):
+    response = client.post("/auth/logout", json={"refresh_token": customer["refresh_token"]})
+    assert response.status_code == 204
+    assert refresh(client, customer["refresh_token"]).status_code == 401
+
+
+def test_unknown_refresh_token_is_rejected(client):
+    assert refresh(client, "no-existe").status_code == 401
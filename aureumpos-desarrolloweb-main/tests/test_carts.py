@@ -0,0 +1,82 @@
+from decimal import Decimal
+import uuid
+import pytest
+from sqlalchemy import event
+from app.database import async_engine, engine
+
+
+@pytest.fixture
+def products(client, admin_headers):
+    category = client.post(
+        "/categories", json={"name": f"Carrito {uuid.uuid4().hex[:8]}"}, headers=admin_headers
+    ).json()
+    return [
+        client.post("/products", json={
+            "name": name, "price": price, "category_id": category["id"]
+        }, headers=admin_headers).json()
+        for name, price in (("Silla", "25.50"), ("Mesa", "80.00"))
+    ]
+
+
+@pytest.fixture
+def statements():
+    """Sentencias ejecutadas por las rutas del carrito (con DATABASE_ASYNC van por el motor asíncrono)"""
+    executed = []
+    route_engine = async_engine.sync_engine if async_engine is not None else engine
+    
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    
+    event.listen(route_engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(route_engine, "before_cursor_execute", count)
+
+
+def cart_total(client, headers) -> Decimal:
+    return Decimal(client.get("/carts", headers=headers).json()["total"])
+
+
+def test_minimal_changes_cost_one_statement_and_match_the_cart(client, customer, products, statements):
+    headers = customer["headers"]
+    chair, table = products
+    client.post("/carts/items", json={"product_id": table["id"], "quantity": 1}, headers=headers)
+    # SQLite no admite escrituras dentro de WITH: la lectura de la respuesta es una segunda sentencia
+    per_change = 1 if engine.dialect.name == "postgresql" else 2
+    
+    statements.clear()
+    response = client.post("/carts/items?return=minimal", json={"product_id": chair["id"], "quantity": 2}, headers=headers)
+    assert len(statements) == per_change
+    change = response.json()
+    assert change["item"]["quantity"] == 2
+    assert change["item"]["product"]["name"] == "Silla"
+    assert Decimal(change["total"]) == cart_total(client, headers) == Decimal("131.00")
+    
+    statements.clear()
+    response = client.put(f"/carts/items/{change['item']['id']}?return=minimal", json={"quantity": 3}, headers=headers)
+    assert len(statements) == per_change
+    assert Decimal(response.json()["total"]) == cart_total(client, headers) == Decimal("156.50")
+    
+    statements.clear()
+    response = client.delete(f"/carts/items/{change['item']['id']}?return=minimal", headers=headers)
+    assert len(statements) == per_change
+    assert response.json()["item"] is None
+    assert Decimal(response.json()["total"]) == cart_total(client, headers) == Decimal("80.00")
+
+
+def test_adding_twice_sums_the_quantity(client, customer, products):
+    headers = customer["headers"]
+    product_id = products[0]["id"]
+    client.post("/carts/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+    cart = client.post("/carts/items", json={"product_id": product_id, "quantity": 2}, headers=headers).json()
+    assert [(item["product_id"], item["quantity"]) for item in cart["items"]] == [(product_id, 3)]
+
+
+def test_items_of_another_cart_are_not_found(client, admin_headers, customer, products):
+    item = client.post(
+        "/carts/items?return=minimal", json={"product_id": products[0]["id"], "quantity": 1}, headers=admin_headers
+    ).json()["item"]
+    
+    headers = customer["headers"]
+    assert client.put(f"/carts/items/{item['id']}", json={"quantity": 5}, headers=headers).status_code == 404
+    assert client.delete(f"/carts/items/{item['id']}", headers=headers).status_code == 404
+    assert client.post("/carts/items", json={"product_id": 10**9, "quantity": 1}, headers=headers).status_code == 404
@@ -0,0 +1,50 @@
+import uuid
+import pytest
+
+
+@pytest.fixture
+def product(client, admin_headers):
+    category = client.post(
+        "/categories", json={"name": f"Caché {uuid.uuid4().hex[:8]}"}, headers=admin_headers
+    ).json()
+    response = client.post("/products", json={
+        "name": "Taza", "price": "4.00", "category_id": category["id"]
+    }, headers=admin_headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("path", ["/products", "/products/{id}", "/categories", "/categories/{category_id}"])
+def test_matching_etag_returns_304(client, product, path):
+    url = path.format(**product)
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    
+    assert client.get(url, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_admin_write_invalidates_the_cached_response(client, admin_headers, product):
+    url = f"/products/{product['id']}"
+    etag = client.get(url).headers["ETag"]
+    
+    response = client.put(url, json={"price": "4.50"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["price"] == "4.50"
+
+
+def test_deleted_product_is_not_served_from_cache(client, admin_headers, product):
+    url = f"/products/{product['id']}"
+    assert client.get(url).status_code == 200
+    assert client.delete(url, headers=admin_headers).status_code == 204
+    assert client.get(url).status_code == 404
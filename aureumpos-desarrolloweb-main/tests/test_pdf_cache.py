@@ -0,0 +1,42 @@
+import os
+from app.core.pdf_cache import PdfDiskCache
+
+
+def publish(cache: PdfDiskCache, key: str, size: int) -> None:
+    tmp_path = cache.temp_path()
+    with open(tmp_path, "wb") as tmp_file:
+        tmp_file.write(b"x" * size)
+    cache.commit(key, tmp_path).close()
+
+
+def test_directory_is_scanned_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = PdfDiskCache(str(tmp_path), max_bytes=10_000)
+    scans = []
+    original_scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(1) or original_scan())
+    
+    for index in range(9):
+        publish(cache, f"pdf{index}", 1000)
+    assert len(scans) == 1  # la cuenta inicial
+    
+    publish(cache, "pdf9", 1500)
+    assert len(scans) == 2
+    sizes = [entry.stat().st_size for entry in os.scandir(tmp_path) if entry.name.endswith(".pdf")]
+    assert sum(sizes) <= 9000
+
+
+def test_least_recently_used_pdfs_are_evicted_first(tmp_path):
+    cache = PdfDiskCache(str(tmp_path), max_bytes=3500)
+    for index in range(3):
+        publish(cache, f"pdf{index}", 1000)
+        os.utime(tmp_path / f"pdf{index}.pdf", (index, index))
+    
+    # Leer pdf0 lo marca como el más reciente
+    cache.open("pdf0").close()
+    publish(cache, "pdf3", 1000)
+    
+    assert cache.open("pdf1") is None
+    for key in ("pdf0", "pdf2", "pdf3"):
+        pdf_file = cache.open(key)
+        assert pdf_file is not None
+        pdf_file.close()
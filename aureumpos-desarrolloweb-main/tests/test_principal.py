@@ -0,0 +1,39 @@
+from app.database import SessionLocal
+from app.models.user import User
+from app.core.principal import principal_cache
+
+
+def set_admin(user_id: int, is_admin: bool, commit: bool = True) -> None:
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).is_admin = is_admin
+        db.flush()
+        db.commit() if commit else db.rollback()
+    finally:
+        db.close()
+
+
+def login(client, email: str) -> dict:
+    response = client.post("/auth/login", json={"email": email, "password": "secreto123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_revoked_admin_role_takes_effect_without_a_new_token(client, customer):
+    user_id = customer["user"]["id"]
+    set_admin(user_id, True)
+    headers = login(client, customer["user"]["email"])
+    assert client.get("/reports/products", headers=headers).status_code == 200
+    
+    # Un rollback no toca la caché; el commit sí
+    set_admin(user_id, False, commit=False)
+    assert principal_cache.get(user_id) is not None
+    set_admin(user_id, False)
+    assert principal_cache.get(user_id) is None
+    assert client.get("/reports/products", headers=headers).status_code == 403
+    
+    # Las rutas de cliente siguen funcionando solo con los claims del token
+    assert client.get("/carts", headers=headers).status_code == 200
+
+
+def test_token_without_admin_claim_is_rejected(client, customer):
+    assert client.get("/reports/products", headers=customer["headers"]).status_code == 403
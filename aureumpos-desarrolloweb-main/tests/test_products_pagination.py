@@ -0,0 +1,64 @@
+import base64
+import json
+import uuid
+import pytest
+
+
+def make_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+def category_products(client, admin_headers):
+    """Categoría nueva con 7 productos, dos de ellos con el mismo precio"""
+    response = client.post(
+        "/categories", json={"name": f"Paginación {uuid.uuid4().hex[:8]}"}, headers=admin_headers
+    )
+    assert response.status_code == 201, response.text
+    category_id = response.json()["id"]
+    for index, price in enumerate(["5.00", "3.00", "9.50", "3.00", "1.25", "7.00", "2.00"]):
+        response = client.post("/products", json={
+            "name": f"Producto {index}", "price": price, "category_id": category_id
+        }, headers=admin_headers)
+        assert response.status_code == 201, response.text
+    return category_id
+
+
+@pytest.mark.parametrize("sort", ["id", "-id", "name", "price", "-price"])
+def test_cursor_walks_every_product_once(client, category_products, sort):
+    seen = []
+    after = None
+    while True:
+        params = {"category_id": category_products, "sort": sort, "limit": 3}
+        if after:
+            params["after"] = after
+        page = client.get("/products/page", params=params).json()
+        seen.extend(page["items"])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        after = page["next_cursor"]
+    
+    assert len(seen) == 7
+    assert len({product["id"] for product in seen}) == 7
+    key = sort.lstrip("-")
+    values = [(float(p[key]) if key == "price" else p[key], p["id"]) for p in seen]
+    assert values == sorted(values, reverse=sort.startswith("-"))
+
+
+@pytest.mark.parametrize("sort, after", [
+    ("id", "no-es-un-cursor"),
+    ("id", make_cursor(["abc"])),
+    ("id", make_cursor([None])),
+    ("id", make_cursor([1, 2])),
+    ("price", make_cursor(["NaN", 1])),
+    ("price", make_cursor(["sNaN", 1])),
+    ("price", make_cursor(["Infinity", 1])),
+    ("price", make_cursor(["-Infinity", 1])),
+    ("price", make_cursor(["barato", 1])),
+    ("name", make_cursor(["Producto", "x"])),
+])
+def test_malformed_cursor_is_rejected(client, sort, after):
+    response = client.get("/products/page", params={"sort": sort, "after": after})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor de paginación inválido"
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import re
+from app.database import SessionLocal
+from app.models.quotation import Quotation
+
+QUOTATIONS = 1000
+THREADS = 16
+
+
+def create_quotation(user_id: int) -> str:
+    db = SessionLocal()
+    try:
+        quotation = Quotation(user_id=user_id, total_amount=Decimal("10.00"))
+        db.add(quotation)
+        db.commit()
+        return quotation.quotation_number
+    finally:
+        db.close()
+
+
+def test_concurrent_quotations_get_unique_numbers(customer):
+    # Con el número anterior (timestamp por segundo) casi todas chocaban con el índice único
+    user_id = customer["user"]["id"]
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        numbers = list(executor.map(create_quotation, [user_id] * QUOTATIONS))
+    
+    assert len(set(numbers)) == QUOTATIONS
+    assert all(re.fullmatch(r"COT-\d{8}-\d{8,}", number) for number in numbers)
+
+
+def test_quotation_numbers_increase(customer):
+    user_id = customer["user"]["id"]
+    first, second = create_quotation(user_id), create_quotation(user_id)
+    assert int(second.rsplit("-", 1)[1]) > int(first.rsplit("-", 1)[1])
@@ -0,0 +1,50 @@
+import uuid
+import pytest
+
+
+@pytest.fixture
+def product_id(client, admin_headers):
+    category = client.post(
+        "/categories", json={"name": f"Cotizaciones {uuid.uuid4().hex[:8]}"}, headers=admin_headers
+    ).json()
+    return client.post("/products", json={
+        "name": "Lámpara", "price": "12.00", "category_id": category["id"]
+    }, headers=admin_headers).json()["id"]
+
+
+def create_quotations(client, headers: dict, product_id: int, count: int) -> list:
+    ids = []
+    for _ in range(count):
+        client.post("/carts/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+        response = client.post("/quotations", params={"clear_cart": True}, headers=headers)
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+def test_legacy_list_pages_with_limit_and_after(client, customer, product_id):
+    headers = customer["headers"]
+    created = create_quotations(client, headers, product_id, 5)
+    
+    full = client.get("/quotations", headers=headers)
+    assert [quotation["id"] for quotation in full.json()] == created[::-1]
+    assert "X-Next-Cursor" not in full.headers
+    
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/quotations", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        assert len(response.json()) <= 2
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 2, "after": cursor}
+    
+    assert seen == full.json()
+
+
+def test_legacy_list_limit_is_capped(client, customer):
+    response = client.get("/quotations", params={"limit": 1001}, headers=customer["headers"])
+    assert response.status_code == 422